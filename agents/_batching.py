@@ -0,0 +1,90 @@
+"""Coalesce concurrent LLM prompts from worker threads onto one background event loop."""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+import google.generativeai as genai
+from agents._llm import generate_async
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class LLMBatcher:
+    """DataLoader-style front for generate_async, usable from synchronous code.
+
+    Prompts submitted within flush_interval_ms of each other (or until batch_size
+    are queued) are dispatched together; identical prompts in the same window
+    share one Gemini call. generateContent has no multi-prompt form, so a batch
+    goes out as concurrent requests over the shared HTTP/2 connection rather
+    than as a single request.
+    """
+
+    def __init__(self, flush_interval_ms: int = 25, batch_size: int = 8):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        # Strong references so in-flight dispatch tasks are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._queue = asyncio.Queue()
+                    loop.create_task(self._drain())
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=run, name="llm-batcher", daemon=True).start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, model: genai.GenerativeModel, prompt: str) -> concurrent.futures.Future:
+        """Queue a prompt; the returned future resolves to the response text."""
+        loop = self._ensure_loop()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        loop.call_soon_threadsafe(self._queue.put_nowait, (model, prompt, future))
+        return future
+
+    async def _drain(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[genai.GenerativeModel, str, concurrent.futures.Future]]):
+        # Keyed on the model handle itself, which also carries its system instruction
+        waiters: Dict[Tuple[genai.GenerativeModel, str], List[concurrent.futures.Future]] = {}
+        for model, prompt, future in batch:
+            waiters.setdefault((model, prompt), []).append(future)
+        if len(waiters) < len(batch):
+            logger.info("Coalesced %s prompts into %s LLM calls", len(batch), len(waiters))
+        keys = list(waiters)
+        results = await asyncio.gather(
+            *(generate_async(model, prompt) for model, prompt in keys), return_exceptions=True
+        )
+        for key, result in zip(keys, results):
+            for future in waiters[key]:
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+llm_batcher = LLMBatcher()
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Async Gemini REST client over a shared HTTP/2 connection."""
+import asyncio
+import json
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+from config.secrets import secrets_manager
+
+_API_ROOT = "https://generativelanguage.googleapis.com/v1beta"
+
+class GeminiClient:
+    """Minimal generateContent client used by the async agent paths.
+
+    Requests multiplex over one keep-alive HTTP/2 connection instead of paying a
+    TLS handshake per call. httpx clients are bound to the event loop they
+    were first used on, so one client is kept per running loop.
+    """
+    
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+    
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=_API_ROOT,
+                http2=True,
+                timeout=60,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                headers={"x-goog-api-key": secrets_manager.get_gemini_api_key()},
+            )
+            self._clients[loop] = client
+        return client
+    
+    async def generate(self, model: str, prompt: str, system_instruction: Optional[str] = None) -> str:
+        """Return the text of a single-turn generateContent call."""
+        response = await self._client().post(
+            f"/{self._model_path(model)}:generateContent", json=self._payload(prompt, system_instruction)
+        )
+        response.raise_for_status()
+        data = response.json()
+        candidates = data.get("candidates") or []
+        if not candidates:
+            raise ValueError(f"Gemini returned no candidates: {data.get('promptFeedback')}")
+        return self._candidate_text(candidates[0])
+    
+    async def stream(self, model: str, prompt: str, system_instruction: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield text chunks of a streamGenerateContent call as they arrive.
+
+        Leaving the loop early closes the stream, which stops the generation.
+        """
+        async with self._client().stream(
+            "POST",
+            f"/{self._model_path(model)}:streamGenerateContent",
+            params={"alt": "sse"},
+            json=self._payload(prompt, system_instruction),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                for candidate in json.loads(line[5:]).get("candidates") or []:
+                    text = self._candidate_text(candidate)
+                    if text:
+                        yield text
+    
+    @staticmethod
+    def _model_path(model: str) -> str:
+        return model if model.startswith("models/") else f"models/{model}"
+    
+    @staticmethod
+    def _payload(prompt: str, system_instruction: Optional[str]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        return payload
+    
+    @staticmethod
+    def _candidate_text(candidate: Dict[str, Any]) -> str:
+        parts = candidate.get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+    
+    async def aclose(self):
+        """Close the client bound to the running event loop, if any."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+gemini_client = GeminiClient()
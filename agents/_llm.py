@@ -0,0 +1,82 @@
+"""Shared Gemini model handles for the agents."""
+import asyncio
+import contextlib
+import functools
+import weakref
+from typing import Callable, List, Optional
+import google.generativeai as genai
+from agents._gemini_http import gemini_client
+from config.secrets import secrets_manager
+from config.settings import settings
+
+# One semaphore per event loop; asyncio primitives must not be shared across loops.
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+# System instruction text per model handle, for the REST path in generate_async
+_system_instructions: "weakref.WeakKeyDictionary[genai.GenerativeModel, str]" = weakref.WeakKeyDictionary()
+
+@functools.cache
+def _configure():
+    genai.configure(api_key=secrets_manager.get_gemini_api_key())
+
+@functools.lru_cache(maxsize=4)
+def get_model(name: str, system_instruction: Optional[str] = None) -> genai.GenerativeModel:
+    """Return a process-wide GenerativeModel for the given model name and system instruction."""
+    _configure()
+    model = genai.GenerativeModel(name, system_instruction=system_instruction)
+    if system_instruction:
+        _system_instructions[model] = system_instruction
+    return model
+
+def embed_text(text: str, task_type: Optional[str] = None) -> List[float]:
+    """Embed a single piece of text with the configured embedding model."""
+    _configure()
+    return genai.embed_content(model=settings.EMBEDDING_MODEL, content=text, task_type=task_type)["embedding"]
+
+def embed_texts(texts: List[str], task_type: Optional[str] = None, batch_size: int = 100) -> List[List[float]]:
+    """Embed many texts, one request per batch of up to batch_size (the API maximum is 100)."""
+    _configure()
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        vectors.extend(genai.embed_content(model=settings.EMBEDDING_MODEL, content=batch, task_type=task_type)["embedding"])
+    return vectors
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_LLM)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+async def generate_async(model: genai.GenerativeModel, prompt: str) -> str:
+    """Run a prompt without blocking the event loop, capped at MAX_CONCURRENT_LLM in flight.
+
+    Goes through the HTTP/2 REST client so concurrent calls share one connection.
+    """
+    async with _llm_semaphore():
+        return await gemini_client.generate(model.model_name, prompt, _system_instructions.get(model))
+
+async def stream_async(
+    model: genai.GenerativeModel,
+    prompt: str,
+    stop: Optional[Callable[[str], bool]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Streaming counterpart of generate_async.
+
+    on_token receives the accumulated text after every chunk; once stop returns
+    True for it the stream is closed and the text so far is returned.
+    """
+    text = ""
+    async with _llm_semaphore():
+        # aclosing so that breaking out early also closes the HTTP stream
+        async with contextlib.aclosing(gemini_client.stream(model.model_name, prompt, _system_instructions.get(model))) as chunks:
+            async for chunk in chunks:
+                text += chunk
+                if on_token is not None:
+                    on_token(text)
+                if stop is not None and stop(text):
+                    break
+    return text
@@ -0,0 +1,75 @@
+"""Exact-match cache for LLM responses, persisted in SQLite."""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_TRAILING_PUNCT_RE = re.compile(r"[?!.,;:]+(?=\s|$)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a user question for cache keys: case, sentence punctuation and spacing ignored."""
+    return _WHITESPACE_RE.sub(" ", _TRAILING_PUNCT_RE.sub("", text.lower())).strip()
+
+class PromptCache:
+    """Return a stored LLM response for a byte-identical prompt."""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = db_path or settings.LLM_CACHE_PATH
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, sql TEXT, created_at INTEGER, expires_at INTEGER)"
+            )
+            # Expired rows are never read again; drop them once per process so the file stays bounded
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (int(time.time()),))
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hash the prompt inputs (prompt version first) into a cache key."""
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired."""
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT sql FROM llm_cache WHERE key = ? AND expires_at > ?",
+                    (key, int(time.time())),
+                ).fetchone()
+            except Exception as e:
+                logger.warning("Prompt cache read failed: %s", e)
+                return None
+        if row:
+            logger.info("Prompt cache hit")
+            return row[0]
+        return None
+
+    def set(self, key: str, value: str):
+        """Store a response under key for PROMPT_CACHE_TTL seconds."""
+        now = int(time.time())
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, sql, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now + settings.PROMPT_CACHE_TTL),
+                )
+                conn.commit()
+            except Exception as e:
+                logger.warning("Prompt cache write failed: %s", e)
@@ -0,0 +1,126 @@
+"""Similarity-keyed cache for LLM responses, persisted in SQLite."""
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from agents._llm import embed_text
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Values a question can differ in while still embedding almost identically: quoted strings,
+# numbers and capitalized words after the first (names such as "Paris")
+_LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\b\d+(?:\.\d+)?\b|(?<!^)\b[A-Z][\w-]*")
+
+def query_literals(text: str) -> List[str]:
+    """Literal values named in a question, in order; entries scoped by them are never reused across values."""
+    return _LITERAL_RE.findall(text.strip())
+
+class SemanticCache:
+    """Return a stored LLM response when a new input is a close paraphrase of a cached one.
+
+    Entries live under a namespace (agent name + prompt version, so editing a
+    prompt orphans its old entries) and an optional scope that must match
+    exactly, e.g. a digest of the result set being summarized.
+    """
+
+    def __init__(self, namespace: str, db_path: Optional[Path] = None, threshold: Optional[float] = None):
+        self.namespace = namespace
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.db_path = db_path or settings.LLM_CACHE_PATH
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # scope -> (unit-norm embedding matrix, cached values, created_at timestamps)
+        self._entries: Optional[Dict[str, Tuple[np.ndarray, List[str], List[float]]]] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_cache ("
+                "namespace TEXT, scope TEXT, embedding BLOB, value TEXT, created_at REAL)"
+            )
+            # Rows older than the TTL (including orphaned prompt versions) are never loaded again
+            self._conn.execute(
+                "DELETE FROM semantic_cache WHERE created_at < ?", (time.time() - settings.SEMANTIC_CACHE_TTL,)
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load(self) -> Dict[str, Tuple[np.ndarray, List[str], List[float]]]:
+        if self._entries is None:
+            cutoff = time.time() - settings.SEMANTIC_CACHE_TTL
+            rows = self._connect().execute(
+                "SELECT scope, embedding, value, created_at FROM semantic_cache "
+                "WHERE namespace = ? AND created_at >= ?",
+                (self.namespace, cutoff),
+            ).fetchall()
+            grouped: Dict[str, Tuple[List[np.ndarray], List[str], List[float]]] = {}
+            for scope, blob, value, created_at in rows:
+                vectors, values, stamps = grouped.setdefault(scope, ([], [], []))
+                vectors.append(np.frombuffer(blob, dtype=np.float32))
+                values.append(value)
+                stamps.append(created_at)
+            self._entries = {
+                scope: (np.vstack(vectors), values, stamps)
+                for scope, (vectors, values, stamps) in grouped.items()
+            }
+        return self._entries
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed text for lookup/store; returns None when caching is off or embedding fails."""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return None
+        try:
+            vector = np.asarray(embed_text(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning("Semantic cache embedding failed: %s", e)
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, embedding: Optional[np.ndarray], scope: str = "") -> Optional[str]:
+        """Return the closest cached value at or above the similarity threshold."""
+        if embedding is None:
+            return None
+        with self._lock:
+            try:
+                entry = self._load().get(scope)
+            except Exception as e:
+                logger.warning("Semantic cache read failed: %s", e)
+                return None
+            if entry is None:
+                return None
+            matrix, values, stamps = entry
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            if stamps[best] < time.time() - settings.SEMANTIC_CACHE_TTL:
+                return None
+            logger.info("Semantic cache hit in %s (similarity %.3f)", self.namespace, scores[best])
+            return values[best]
+
+    def store(self, embedding: Optional[np.ndarray], value: str, scope: str = ""):
+        """Persist a value under the given embedding."""
+        if embedding is None:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                entries = self._load()
+                conn = self._connect()
+                conn.execute(
+                    "INSERT INTO semantic_cache (namespace, scope, embedding, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, scope, embedding.astype(np.float32).tobytes(), value, now),
+                )
+                conn.commit()
+                matrix, values, stamps = entries.get(scope, (np.empty((0, embedding.shape[0]), dtype=np.float32), [], []))
+                entries[scope] = (np.vstack([matrix, embedding]), values + [value], stamps + [now])
+            except Exception as e:
+                logger.warning("Semantic cache write failed: %s", e)
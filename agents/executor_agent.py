@@ -1,17 +1,30 @@
 """SQL Executor Agent."""
-from typing import Dict, Any, List
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Any, List, Optional, Tuple
+from config.settings import settings
 from graph.state import GraphState
 from database.connection import db_connection
 from utils.logger import setup_logger
+from utils.helpers import is_safe_query, row_count_query
 
 logger = setup_logger(__name__)
 
+# Runs a state's queued statements while the calling thread streams the main query
+_pending_runner = ThreadPoolExecutor(max_workers=settings.DB_POOL_SIZE, thread_name_prefix="executor-pending")
+
 class ExecutorAgent:
     """SQL Execution Agent."""
     
     def execute_sql(self, state: GraphState) -> GraphState:
-        """Execute validated SQL query."""
+        """Execute validated SQL query, plus any queued `pending_sql` statements in parallel.
+        
+        Queued statements (the validator queues the total-row count) run on their
+        own pooled connections while the main query streams on this thread.
+        """
         sql_query = state.get("generated_sql", "")
+        pending_sql = state.get("pending_sql") or []
         
         # Check if execution is approved
         if not state.get("execution_approved", False):
@@ -19,24 +32,112 @@ class ExecutorAgent:
             logger.info("Awaiting human approval for execution")
             return state
         
-        logger.info(f"Executing SQL: {sql_query}")
+        logger.info("Executing SQL (%d chars, +%d queued): %.400s", len(sql_query), len(pending_sql), sql_query)
         
         try:
-            # Execute query
-            results = db_connection.execute_query(sql_query)
-            
-            state["query_results"] = results
-            state["execution_error"] = None
-            state["step"] = "executed"
-            
-            logger.info(f"Query executed successfully. Returned {len(results)} rows")
-            
+            self._check_pending(pending_sql)
+            pending_future = _pending_runner.submit(db_connection.execute_many, pending_sql) if pending_sql else None
+            results, truncated = self._run_query(sql_query)
+            self._apply_results(state, results, truncated, self._pending_outcome(pending_future))
         except Exception as e:
-            logger.error(f"Execution error: {str(e)}")
-            state["query_results"] = None
-            state["execution_error"] = str(e)
-            state["step"] = "execution_failed"
+            self._apply_error(state, e)
         
         return state
+    
+    async def execute_sql_async(self, state: GraphState) -> GraphState:
+        """Async variant of execute_sql; the main and queued queries are awaited together."""
+        sql_query = state.get("generated_sql", "")
+        pending_sql = state.get("pending_sql") or []
+        
+        # Check if execution is approved
+        if not state.get("execution_approved", False):
+            state["step"] = "awaiting_approval"
+            logger.info("Awaiting human approval for execution")
+            return state
+        
+        logger.info("Executing SQL (%d chars, +%d queued): %.400s", len(sql_query), len(pending_sql), sql_query)
+        
+        try:
+            self._check_pending(pending_sql)
+            (results, truncated), pending_results = await asyncio.gather(
+                asyncio.to_thread(self._run_query, sql_query), self._run_pending_async(pending_sql)
+            )
+            self._apply_results(state, results, truncated, pending_results)
+        except Exception as e:
+            self._apply_error(state, e)
+        
+        return state
+    
+    def _check_pending(self, pending_sql: List[str]):
+        # Queued statements are not shown to the user for approval
+        for pending in pending_sql:
+            is_safe, safety_message = is_safe_query(pending)
+            if not is_safe:
+                raise ValueError(f"Queued query rejected: {safety_message}")
+    
+    def _run_query(self, sql_query: str) -> Tuple[List[Dict[str, Any]], bool]:
+        # Keep at most MAX_RESULT_ROWS rows and stop reading at the first one past them
+        rows = db_connection.iter_query(sql_query)
+        try:
+            results = list(islice(rows, settings.MAX_RESULT_ROWS + 1))
+        finally:
+            rows.close()
+        truncated = len(results) > settings.MAX_RESULT_ROWS
+        if truncated:
+            results.pop()
+        return results, truncated
+    
+    def _pending_outcome(self, future: Optional[Future]) -> Optional[List[List[Dict[str, Any]]]]:
+        # A failed queued statement only loses its own results, never the main query's
+        if future is None:
+            return []
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning("Queued queries failed: %s", e)
+            return None
+    
+    async def _run_pending_async(self, pending_sql: List[str]) -> Optional[List[List[Dict[str, Any]]]]:
+        try:
+            return list(await asyncio.gather(*(db_connection.execute_query_async(query) for query in pending_sql)))
+        except Exception as e:
+            logger.warning("Queued queries failed: %s", e)
+            return None
+    
+    def _apply_results(
+        self,
+        state: GraphState,
+        results: List[Dict[str, Any]],
+        truncated: bool,
+        pending_results: Optional[List[List[Dict[str, Any]]]],
+    ):
+        state["query_results"] = results
+        state["query_results_preview"] = results[:3]
+        # Past the cap the total comes from the queued count query, if there was one and it ran
+        state["query_row_count"] = self._queued_total(state, pending_results) if truncated else len(results)
+        state["query_rows_truncated"] = truncated
+        state["pending_results"] = pending_results
+        state["execution_error"] = None
+        state["step"] = "executed"
+        
+        logger.info("Query executed successfully. Returned %s%s rows", "more than " if truncated else "", len(results))
+    
+    def _queued_total(self, state: GraphState, pending_results: Optional[List[List[Dict[str, Any]]]]) -> Optional[int]:
+        count_sql = row_count_query(state.get("generated_sql", ""), settings.MAX_RESULT_ROWS)
+        pending_sql = list(state.get("pending_sql") or [])
+        if not pending_results or count_sql not in pending_sql:
+            return None
+        rows = pending_results[pending_sql.index(count_sql)]
+        return int(rows[0]['row_count']) if rows else None
+    
+    def _apply_error(self, state: GraphState, e: Exception):
+        logger.error("Execution error: %s", e)
+        state["query_results"] = None
+        state["query_results_preview"] = None
+        state["query_row_count"] = None
+        state["query_rows_truncated"] = False
+        state["pending_results"] = None
+        state["execution_error"] = str(e)
+        state["step"] = "execution_failed"
 
 executor_agent = ExecutorAgent()
\ No newline at end of file
@@ -1,70 +1,154 @@
 """Result Formatter Agent."""
-import google.generativeai as genai
-from typing import Dict, Any, List
-import pandas as pd
+import asyncio
+import hashlib
+import re
+from typing import Dict, Any, List, Optional, Tuple
 from graph.state import GraphState
-from config.secrets import secrets_manager
 from config.settings import settings
+from agents._llm import get_model, generate_async
+from agents._semantic_cache import SemanticCache
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Bump whenever the prompt text changes so cached summaries are not reused
+PROMPT_VERSION = "v2"
+
+# Shared prompt head; the question and result sample are appended after it.
+FORMATTER_SYSTEM_PREFIX = """Provide a brief, natural language summary of the query results below for the user.
+
+Provide a concise 2-3 sentence summary that:
+1. Confirms what data was retrieved
+2. Highlights key findings or patterns
+3. Is written in natural, user-friendly language and easy to understand
+"""
+
+# Column names that look like aggregate outputs (COUNT(*) AS total_orders, avg_price, ...);
+# the word is anchored to "_" or the ends so that country, discount or minute don't match
+_AGGREGATE_RE = re.compile(r"(?:^|_)(count|sum|avg|average|min|max|total)(?:_|$)", re.IGNORECASE)
+
 class FormatterAgent:
     """Result Formatting Agent."""
     
     def __init__(self):
-        genai.configure(api_key=secrets_manager.get_gemini_api_key())
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        self.model = get_model(settings.GEMINI_MODEL)
+        self.cache = SemanticCache(f"formatter:{PROMPT_VERSION}")
     
     def format_results(self, state: GraphState) -> GraphState:
         """Format query results for user-friendly display."""
-        results = state.get("query_results", [])
+        preview, row_count = self._result_overview(state)
         user_query = state["user_query"]
         
         logger.info("Formatting query results")
         
         try:
-            if not results:
+            if not row_count:
                 state["formatted_response"] = "No results found for your query."
                 state["step"] = "complete"
                 return state
             
-            # Create summary with LLM
-            df = pd.DataFrame(results)
-            summary = f"Found {len(results)} results.\n\n"
+            template = self._template_summary(preview, row_count)
+            if template is not None:
+                state["formatted_response"] = template
+                state["step"] = "complete"
+                return state
             
-            # Get column names and sample data
-            columns = list(df.columns)
-            sample_rows = df.head(3).to_dict('records')
+            embedding = self.cache.embed(user_query)
+            scope = self._result_scope(preview, row_count)
+            summary_text = self.cache.lookup(embedding, scope)
+            if summary_text is None:
+                response = self.model.generate_content(self._build_prompt(user_query, preview, row_count))
+                summary_text = response.text
+                self.cache.store(embedding, summary_text, scope)
+            self._apply_summary(state, row_count, summary_text)
             
-            prompt = f"""Provide a brief, natural language summary of these query results for the user.
-
+        except Exception as e:
+            self._apply_error(state, e)
+        
+        return state
+    
+    async def format_results_async(self, state: GraphState) -> GraphState:
+        """Async variant of format_results; the Gemini call does not block the event loop."""
+        preview, row_count = self._result_overview(state)
+        user_query = state["user_query"]
+        
+        logger.info("Formatting query results")
+        
+        try:
+            if not row_count:
+                state["formatted_response"] = "No results found for your query."
+                state["step"] = "complete"
+                return state
+            
+            template = self._template_summary(preview, row_count)
+            if template is not None:
+                state["formatted_response"] = template
+                state["step"] = "complete"
+                return state
+            
+            embedding = await asyncio.to_thread(self.cache.embed, user_query)
+            scope = self._result_scope(preview, row_count)
+            summary_text = self.cache.lookup(embedding, scope)
+            if summary_text is None:
+                summary_text = await generate_async(self.model, self._build_prompt(user_query, preview, row_count))
+                self.cache.store(embedding, summary_text, scope)
+            self._apply_summary(state, row_count, summary_text)
+            
+        except Exception as e:
+            self._apply_error(state, e)
+        
+        return state
+    
+    def _result_overview(self, state: GraphState) -> Tuple[List[Dict[str, Any]], int]:
+        """Return the sample rows and total row count recorded by the executor."""
+        results = state.get("query_results") or []
+        preview = state.get("query_results_preview") or results[:3]
+        row_count = state.get("query_row_count")
+        if row_count is None:
+            row_count = len(results)
+        return preview, row_count
+    
+    def _template_summary(self, preview: List[Dict[str, Any]], row_count: int) -> Optional[str]:
+        """Deterministic summary for single-row scalar/aggregate results, or None to use the LLM."""
+        if row_count != 1:
+            return None
+        row = preview[0]
+        if len(row) > 2 and not all(_AGGREGATE_RE.search(str(column)) for column in row):
+            return None
+        return "Result: " + ", ".join(f"{column} = {value}" for column, value in row.items())
+    
+    def _result_scope(self, preview: List[Dict[str, Any]], row_count: int) -> str:
+        # A summary is only reused for the same columns, row count and sample rows
+        signature = repr((list(preview[0].keys()), row_count, preview))
+        return hashlib.sha256(signature.encode()).hexdigest()
+    
+    def _build_prompt(self, user_query: str, preview: List[Dict[str, Any]], row_count: int) -> str:
+        # Rows are dicts keyed by column name (see DatabaseConnection.iter_query)
+        columns = list(preview[0].keys())
+        sample_rows = preview
+        
+        return FORMATTER_SYSTEM_PREFIX + f"""
 User's Question: {user_query}
 
 Columns: {', '.join(columns)}
-Number of Results: {len(results)}
+Number of Results: {row_count}
 Sample Data: {sample_rows}
 
-Provide a concise 2-3 sentence summary that:
-1. Confirms what data was retrieved
-2. Highlights key findings or patterns
-3. Is written in natural, user-friendly language and easy to understand
-
 Summary:"""
-            
-            response = self.model.generate_content(prompt)
-            summary += response.text.strip()
-            
-            state["formatted_response"] = summary
-            state["step"] = "complete"
-            
-            logger.info("Results formatted successfully")
-            
-        except Exception as e:
-            logger.error(f"Formatting error: {str(e)}")
-            state["formatted_response"] = f"Results retrieved but formatting failed: {str(e)}"
-            state["step"] = "complete"
+    
+    def _apply_summary(self, state: GraphState, row_count: int, summary_text: str):
+        more = "more than " if state.get("query_rows_truncated") and state.get("query_row_count") is None else ""
+        summary = f"Found {more}{row_count} results.\n\n"
+        summary += summary_text.strip()
         
-        return state
+        state["formatted_response"] = summary
+        state["step"] = "complete"
+        
+        logger.info("Results formatted successfully")
+    
+    def _apply_error(self, state: GraphState, e: Exception):
+        logger.error("Formatting error: %s", e)
+        state["formatted_response"] = f"Results retrieved but formatting failed: {str(e)}"
+        state["step"] = "complete"
 
 formatter_agent = FormatterAgent()
\ No newline at end of file
@@ -1,70 +1,123 @@
 """NLU Intent Agent for understanding user queries."""
-import google.generativeai as genai
-from typing import Dict, Any
-from config.secrets import secrets_manager
+import asyncio
+import re
+from typing import Dict, Any, FrozenSet, List, Optional
 from config.settings import settings
+from agents._llm import get_model, generate_async
+from agents._semantic_cache import SemanticCache, query_literals
+from database.schema_cache import schema_cache
 from graph.state import GraphState
 from utils.logger import setup_logger
 
+__all__ = ["NLUAgent", "nlu_agent"]
+
 logger = setup_logger(__name__)
 
-class NLUAgent:
-    """Natural Language Understanding Agent."""
-    
-    def __init__(self):
-        genai.configure(api_key=secrets_manager.get_gemini_api_key())
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-    
-    def analyze_intent(self, state: GraphState) -> GraphState:
-        """Analyze user intent and extract entities."""
-        user_query = state["user_query"]
-        logger.info(f"Analyzing intent for query: {user_query}")
-        
-        prompt = f"""You are an expert NLU agent helping a Text-to-SQL system.
+# Bump whenever the prompt text or the cache scope changes so cached responses are not reused
+PROMPT_VERSION = "v3"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def _singular(word: str) -> str:
+    return word[:-1] if word.endswith('s') else word
+
+# Everything static lives here; only the user query is appended per call.
+NLU_SYSTEM_PREFIX = """You are an expert NLU agent helping a Text-to-SQL system.
 Read the user's request and extract:
 1) Intent: high-level goal such as list/filter/aggregate/join/detail/count/top-n.
 2) Entities: important nouns/values (companies, cities, dates, ids, statuses, budget thresholds, etc.).
 3) Tables Likely Needed: from the known tables in this database. Use only exact table names you know.
 
-User Query: {user_query}
-
 Respond exactly in this format (one per line):
 Intent: <intent>
 Entities: <comma-separated values>
 Tables Likely Needed: <comma-separated exact table names>
 """
+
+class NLUAgent:
+    """Natural Language Understanding Agent."""
+    
+    def __init__(self):
+        self.model = get_model(settings.GEMINI_MODEL)
+        self.cache = SemanticCache(f"nlu:{PROMPT_VERSION}")
+        self._tables_source: Optional[Dict[str, Any]] = None
+        self._table_words: FrozenSet[str] = frozenset()
+    
+    def analyze_intent(self, state: GraphState) -> GraphState:
+        """Analyze user intent and extract entities."""
+        user_query = state["user_query"]
+        logger.info("Analyzing intent for query: %s", user_query)
+        
+        try:
+            embedding = self.cache.embed(user_query)
+            scope = self._semantic_scope(user_query)
+            result_text = self.cache.lookup(embedding, scope)
+            if result_text is None:
+                response = self.model.generate_content(self._build_prompt(user_query))
+                result_text = response.text
+                self.cache.store(embedding, result_text, scope)
+            self._apply_response(state, result_text)
+        except Exception as e:
+            self._apply_error(state, e)
+        
+        return state
+    
+    async def analyze_intent_async(self, state: GraphState) -> GraphState:
+        """Async variant of analyze_intent; the Gemini call does not block the event loop."""
+        user_query = state["user_query"]
+        logger.info("Analyzing intent for query: %s", user_query)
         
         try:
-            response = self.model.generate_content(prompt)
-            result_text = response.text
-            
-            # Parse response
-            intent = "unknown"
-            entities = []
-            tables = []
-            
-            for line in result_text.split('\n'):
-                if line.startswith('Intent:'):
-                    intent = line.replace('Intent:', '').strip()
-                elif line.startswith('Entities:'):
-                    entities_str = line.replace('Entities:', '').strip()
-                    entities = [e.strip() for e in entities_str.split(',') if e.strip()]
-                elif line.startswith('Tables Likely Needed:'):
-                    tables_str = line.replace('Tables Likely Needed:', '').strip()
-                    tables = [t.strip() for t in tables_str.split(',') if t.strip()]
-            
-            state["intent"] = intent
-            state["entities"] = entities
-            state["relevant_tables"] = tables
-            state["step"] = "nlu_complete"
-            
-            logger.info(f"Intent: {intent}, Entities: {entities}, Tables: {tables}")
-            
+            embedding = await asyncio.to_thread(self.cache.embed, user_query)
+            scope = self._semantic_scope(user_query)
+            result_text = self.cache.lookup(embedding, scope)
+            if result_text is None:
+                result_text = await generate_async(self.model, self._build_prompt(user_query))
+                self.cache.store(embedding, result_text, scope)
+            self._apply_response(state, result_text)
         except Exception as e:
-            logger.error(f"NLU error: {str(e)}")
-            state["error"] = f"Intent analysis failed: {str(e)}"
-            state["step"] = "error"
+            self._apply_error(state, e)
         
         return state
+    
+    def _semantic_scope(self, user_query: str) -> str:
+        # A paraphrase only reuses the intent, entities and tables when it names the same
+        # literals ("2023", "Acme") and the same table words ("clients" vs "invoices")
+        tables = schema_cache.cache.get('tables', {})
+        if self._tables_source is not tables:
+            self._table_words = frozenset(_singular(word) for name in tables for word in _WORD_RE.findall(name.lower()))
+            self._tables_source = tables
+        words = {_singular(word) for word in _WORD_RE.findall(user_query.lower())}
+        named: List[str] = sorted(words & self._table_words)
+        return "\x1f".join([*query_literals(user_query), *named])
+    
+    def _build_prompt(self, user_query: str) -> str:
+        return NLU_SYSTEM_PREFIX + f"""
+User Query: {user_query}
+"""
+    
+    def _apply_response(self, state: GraphState, result_text: str):
+        # Parse response: one "Key: value" pair per line
+        fields = {}
+        for line in result_text.splitlines():
+            key, sep, value = line.partition(':')
+            if sep:
+                fields[key.strip().lower()] = value.strip()
+        
+        intent = fields.get('intent') or "unknown"
+        entities = [e.strip() for e in fields.get('entities', '').split(',') if e.strip()]
+        tables = [t.strip() for t in fields.get('tables likely needed', '').split(',') if t.strip()]
+        
+        state["intent"] = intent
+        state["entities"] = entities
+        state["relevant_tables"] = tables
+        state["step"] = "nlu_complete"
+        
+        logger.info("Intent: %s, Entities: %s, Tables: %s", intent, entities, tables)
+    
+    def _apply_error(self, state: GraphState, e: Exception):
+        logger.error("NLU error: %s", e)
+        state["error"] = f"Intent analysis failed: {str(e)}"
+        state["step"] = "error"
 
 nlu_agent = NLUAgent()
\ No newline at end of file
@@ -1,21 +1,155 @@
 """Schema Agent for retrieving relevant schema information."""
+import asyncio
+import hashlib
+import heapq
+import math
 import re
-from typing import Dict, Any, List
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from agents._llm import embed_text, embed_texts
+from config.settings import settings
 from graph.state import GraphState
+from database.connection import db_connection
 from database.schema_cache import schema_cache
 from utils.logger import setup_logger
 
+__all__ = ["SchemaAgent", "schema_agent"]
+
 logger = setup_logger(__name__)
 
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = frozenset({"show", "list", "get", "find", "all", "the", "me", "for", "with", "in", "of", "and", "top"})
+
 def _tokenize(text: str) -> set[str]:
-    text = (text or "").lower()
-    tokens = set(re.findall(r"[a-z0-9_]+", text))
-    stopwords = {"show", "list", "get", "find", "all", "the", "me", "for", "with", "in", "of", "and", "top"}
-    return tokens - stopwords
+    return {t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS}
+
+def _identifier_tokens(name: str) -> frozenset[str]:
+    # Also split snake_case identifiers so "owner_email" matches "email"
+    return frozenset(_tokenize(name) | _tokenize(name.replace('_', ' ')))
+
+_NULLABLE = {"YES": "NULL"}
+
+# Upper bound on tables picked by lexical matching when NLU names none we know
+MAX_MATCHED_TABLES = 5
+
+def _live_table_info(columns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar table entry from get_table_schema rows."""
+    return {
+        'column_names': [col['column_name'] for col in columns],
+        'data_types': [col['data_type'] for col in columns],
+        'is_nullable': [col['is_nullable'] for col in columns],
+    }
 
 class SchemaAgent:
     """Schema Introspection and Retrieval Agent."""
     
+    def __init__(self):
+        self._index_source: Optional[Dict[str, Any]] = None
+        # token -> [(table, column)]; column is None for tokens of the table name itself
+        self._token_index: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        # token -> inverse document frequency over tables, so "id" or "created_at" count for little
+        self._token_idf: Dict[str, float] = {}
+        self._embedding_source: Optional[Dict[str, Any]] = None
+        # (owning table of each row, float16 unit-norm column embeddings)
+        self._embedding_index: Optional[Tuple[List[str], np.ndarray]] = None
+    
+    def _get_token_index(self, schema: Dict[str, Any]) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+        """Inverted index over table and column names, rebuilt only when the schema object changes."""
+        if self._index_source is not schema:
+            index = defaultdict(list)
+            for table_name, table_info in schema.get('tables', {}).items():
+                for token in _identifier_tokens(table_name):
+                    index[token].append((table_name, None))
+                for column_name in table_info['column_names']:
+                    for token in _identifier_tokens(column_name):
+                        index[token].append((table_name, column_name))
+            self._token_index = dict(index)
+            n_tables = max(len(schema.get('tables', {})), 1)
+            self._token_idf = {
+                token: math.log(1 + n_tables / len({table for table, _ in postings}))
+                for token, postings in self._token_index.items()
+            }
+            self._index_source = schema
+        return self._token_index
+    
+    def _match_tables(self, user_query: str, schema: Dict[str, Any]) -> List[str]:
+        """Rank tables by IDF-weighted query-token hits on the table name and its column names."""
+        q_tokens = _tokenize(user_query)
+        q_tokens |= {t[:-1] for t in q_tokens if t.endswith('s')}
+        index = self._get_token_index(schema)
+        table_hits = defaultdict(float)
+        # table -> column -> weight of the rarest query token naming it
+        column_hits = defaultdict(dict)
+        for token in q_tokens:
+            weight = self._token_idf.get(token, 0.0)
+            for table_name, column_name in index.get(token, ()):
+                if column_name is None:
+                    table_hits[table_name] += weight
+                else:
+                    hits = column_hits[table_name]
+                    hits[column_name] = max(hits.get(column_name, 0.0), weight)
+        scores = {
+            t: 2 * table_hits[t] + sum(column_hits[t].values())
+            for t in table_hits.keys() | column_hits.keys()
+        }
+        return heapq.nsmallest(MAX_MATCHED_TABLES, scores, key=lambda t: (-scores[t], t))
+    
+    def _get_embedding_index(self, schema: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+        """Column-description embeddings, built in batched requests and persisted across restarts."""
+        if self._embedding_source is not schema:
+            owners, docs = [], []
+            for table_name, table_info in schema.get('tables', {}).items():
+                owners.extend([table_name] * len(table_info['column_names']))
+                docs.extend(
+                    f"{table_name}.{column_name}: {data_type}"
+                    for column_name, data_type in zip(table_info['column_names'], table_info['data_types'])
+                )
+            digest = hashlib.sha256("\n".join([settings.EMBEDDING_MODEL, *docs]).encode()).hexdigest()
+            path = settings.SCHEMA_EMBEDDINGS_PATH
+            matrix = None
+            if path.exists():
+                with np.load(path) as stored:
+                    if str(stored['digest']) == digest:
+                        matrix = stored['matrix']
+            if matrix is None:
+                vectors = np.asarray(embed_texts(docs, task_type="RETRIEVAL_DOCUMENT"), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                matrix = vectors.astype(np.float16)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                np.savez(path, digest=digest, matrix=matrix)
+            self._embedding_index = (owners, matrix)
+            self._embedding_source = schema
+        return self._embedding_index
+    
+    def _semantic_match(self, user_query: str, schema: Dict[str, Any]) -> List[str]:
+        """Rank tables by their best column-embedding similarity to the question."""
+        if not settings.SCHEMA_EMBEDDINGS_ENABLED or not user_query:
+            return []
+        try:
+            owners, matrix = self._get_embedding_index(schema)
+            if not owners:
+                return []
+            query_vector = np.asarray(embed_text(user_query, task_type="RETRIEVAL_QUERY"), dtype=np.float32)
+        except Exception as e:
+            logger.warning("Semantic schema matching unavailable: %s", e)
+            return []
+        scores = matrix.astype(np.float32) @ query_vector
+        k = min(4 * MAX_MATCHED_TABLES, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        ranked = []
+        for i in top[np.argsort(-scores[top])]:
+            if owners[i] not in ranked:
+                ranked.append(owners[i])
+        return ranked[:MAX_MATCHED_TABLES]
+    
+    def _unknown_tables(self, state: GraphState, schema: Dict[str, Any]) -> List[str]:
+        """NLU table names missing from a schema read from the database (e.g. created since the last refresh)."""
+        if 'fingerprint' not in schema:
+            # Only refreshed schemas carry a fingerprint; seed, Excel and manual schemas may not match the database
+            return []
+        return [t for t in dict.fromkeys(state.get("relevant_tables", [])) if not schema_cache.resolve_table_name(t)]
+    
     def get_relevant_schema(self, state: GraphState) -> GraphState:
         """Get schema information relevant to the query."""
         logger.info("Retrieving relevant schema information")
@@ -23,44 +157,105 @@ class SchemaAgent:
         try:
             # Get full schema
             schema = schema_cache.get_schema()
-            
-            # Filter to relevant tables; normalize simple plurals to match cache keys
-            relevant_tables = state.get("relevant_tables", [])
-            normalized = []
-            for t in relevant_tables:
-                key = t.strip()
-                if key.lower().endswith('s'):
-                    key = key[:-1]
-                normalized.append(key)
-            relevant_tables = normalized or list(schema.get('tables', {}).keys())
-            
-            if not relevant_tables:
-                # If no tables identified, include all
-                relevant_tables = list(schema.get('tables', {}).keys())
-            
-            # Build schema context
-            schema_parts = []
-            for table_name in relevant_tables:
-                table_info = schema.get('tables', {}).get(table_name) or schema.get('tables', {}).get(table_name.lower()) or schema.get('tables', {}).get(table_name.capitalize())
-                if table_info:
-                    schema_parts.append(f"\n### Table: {table_name}")
-                    schema_parts.append("Columns:")
-                    for col in table_info['columns']:
-                        nullable = "NULL" if col['is_nullable'] == 'YES' else "NOT NULL"
-                        schema_parts.append(
-                            f"  - {col['column_name']} ({col['data_type']}) {nullable}"
-                        )
-            
-            state["schema_context"] = "\n".join(schema_parts)
-            state["step"] = "schema_retrieved"
-            
-            logger.info(f"Schema context built for tables: {relevant_tables}")
-            
+            live = {}
+            for table_name in self._unknown_tables(state, schema):
+                try:
+                    live[table_name] = db_connection.get_table_schema(table_name)
+                except Exception as e:
+                    logger.warning("Live schema lookup for %s failed: %s", table_name, e)
+            self._build_context(state, schema, live)
         except Exception as e:
-            logger.error(f"Schema retrieval error: {str(e)}")
+            logger.error("Schema retrieval error: %s", e)
             state["error"] = f"Schema retrieval failed: {str(e)}"
             state["step"] = "error"
         
         return state
+    
+    async def get_relevant_schema_async(self, state: GraphState) -> GraphState:
+        """Async variant of get_relevant_schema; unknown tables are looked up concurrently."""
+        logger.info("Retrieving relevant schema information")
+        
+        try:
+            schema = await asyncio.to_thread(schema_cache.get_schema)
+            unknown = self._unknown_tables(state, schema)
+            lookups = await asyncio.gather(
+                *(db_connection.get_table_schema_async(t) for t in unknown), return_exceptions=True
+            )
+            live = {}
+            for table_name, columns in zip(unknown, lookups):
+                if isinstance(columns, Exception):
+                    logger.warning("Live schema lookup for %s failed: %s", table_name, columns)
+                else:
+                    live[table_name] = columns
+            self._build_context(state, schema, live)
+        except Exception as e:
+            logger.error("Schema retrieval error: %s", e)
+            state["error"] = f"Schema retrieval failed: {str(e)}"
+            state["step"] = "error"
+        
+        return state
+    
+    def _build_context(self, state: GraphState, schema: Dict[str, Any], live: Dict[str, List[Dict[str, Any]]]):
+        """Select the relevant tables and write their description to state["schema_context"].
+
+        `live` holds get_table_schema rows for NLU-named tables the cached schema lacks;
+        tables that came back with columns are described for this request only.
+        """
+        tables = schema.get('tables', {})
+        live_tables = {name: _live_table_info(columns) for name, columns in live.items() if columns}
+        
+        # Map the NLU table names onto cache keys (case-insensitive, simple plurals)
+        relevant_tables = []
+        for t in state.get("relevant_tables", []):
+            canonical = schema_cache.resolve_table_name(t) or (t if t in live_tables else None)
+            if canonical and canonical not in relevant_tables:
+                relevant_tables.append(canonical)
+        if live_tables:
+            tables = {**tables, **live_tables}
+        
+        if not relevant_tables:
+            # NLU named no known table: match the question against table/column names,
+            # then by embedding similarity, and include all tables if nothing matches
+            user_query = state.get("user_query", "")
+            relevant_tables = (
+                self._match_tables(user_query, schema)
+                or self._semantic_match(user_query, schema)
+                or list(tables.keys())
+            )
+        
+        # Tables the selection references by foreign key are likely join targets
+        for table_name in list(relevant_tables):
+            for fk in tables.get(table_name, {}).get('foreign_keys', ()):
+                if fk['referenced_table'] in tables and fk['referenced_table'] not in relevant_tables:
+                    relevant_tables.append(fk['referenced_table'])
+        
+        # Build schema context
+        schema_parts = []
+        append = schema_parts.append
+        for table_name in relevant_tables:
+            table_info = tables.get(table_name)
+            if table_info:
+                append(f"\n### Table: {table_name}")
+                if 'row_count' in table_info:
+                    append(f"Rows (approx.): {table_info['row_count']}")
+                append("Columns:")
+                schema_parts.extend(
+                    f"  - {column_name} ({data_type}) {_NULLABLE.get(is_nullable, 'NOT NULL')}"
+                    for column_name, data_type, is_nullable in zip(
+                        table_info['column_names'], table_info['data_types'], table_info['is_nullable']
+                    )
+                )
+                foreign_keys = table_info.get('foreign_keys')
+                if foreign_keys:
+                    append("Foreign keys:")
+                    schema_parts.extend(
+                        f"  - {fk['column_name']} -> {fk['referenced_table']}.{fk['referenced_column']}"
+                        for fk in foreign_keys
+                    )
+        
+        state["schema_context"] = "\n".join(schema_parts)
+        state["step"] = "schema_retrieved"
+        
+        logger.info("Schema context built for tables: %s", relevant_tables)
 
 schema_agent = SchemaAgent()
\ No newline at end of file
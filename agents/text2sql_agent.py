@@ -1,31 +1,38 @@
 """Text to SQL Agent for generating SQL queries."""
-import google.generativeai as genai
-from typing import Dict, Any
-from config.secrets import secrets_manager
+import asyncio
+import hashlib
+import re
+from typing import Callable, Dict, Any, Optional
+import numpy as np
 from config.settings import settings
+from agents._llm import get_model, stream_async
+from agents._batching import llm_batcher
+from agents._prompt_cache import PromptCache, normalize_query
+from agents._semantic_cache import SemanticCache, query_literals
 from graph.state import GraphState
 from utils.logger import setup_logger
-from utils.helpers import sanitize_sql, ensure_top_limit
+from utils.helpers import sanitize_sql_for_exec, ensure_top_limit, is_safe_query
+
+__all__ = ["Text2SQLAgent", "text2sql_agent", "generate_sql"]
 
 logger = setup_logger(__name__)
 
-class Text2SQLAgent:
-    """SQL Generation Agent."""
-    
-    def __init__(self):
-        genai.configure(api_key=secrets_manager.get_gemini_api_key())
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-    
-    def generate_sql(self, state: GraphState) -> GraphState:
-        """Generate SQL query from natural language."""
-        user_query = state["user_query"]
-        schema_context = state.get("schema_context", "")
-        
-        logger.info(f"Generating SQL for: {user_query}")
-        
-        prompt = f"""You are a senior data engineer generating safe, production-quality T-SQL for Microsoft SQL Server.
+# First fenced block, with or without a closing fence
+_FENCE_RE = re.compile(r"```(?:sql)?\s*(.*?)(?:```|\Z)", re.DOTALL | re.IGNORECASE)
+# A complete fenced block; anything the model streams after it is commentary
+_CLOSED_FENCE_RE = re.compile(r"```(?:sql)?\s*.*?```", re.DOTALL | re.IGNORECASE)
 
-You will receive the user request and the available schema. Your job is to write a single, safe SELECT statement.
+# Bump whenever the prompt text changes so cached SQL is not reused
+PROMPT_VERSION = "v4"
+
+# Paraphrase reuse is riskier for SQL than for summaries, so demand a closer match
+SQL_SIMILARITY_THRESHOLD = 0.95
+
+# Sent once as the model's system instruction; each request carries only the
+# schema context and the question.
+T2SQL_SYSTEM_INSTRUCTION = """You are a senior data engineer generating safe, production-quality T-SQL for Microsoft SQL Server.
+
+You will receive the available schema and the user request. Your job is to write a single, safe SELECT statement.
 
 STRICT RULES:
 - Output only the SQL, no commentary or markdown fences.
@@ -40,39 +47,154 @@ STRICT RULES:
 - Prefer COUNT(*) for counts; use GROUP BY for aggregations.
 - For date filters, use BETWEEN or >= <= and proper CAST/CONVERT if needed.
 
-SCHEMA (authoritative):
-{schema_context}
+Return only the final SQL (no code fences, no explanation).
+"""
 
-USER REQUEST:
-{user_query}
+CONSERVATIVE_SYSTEM_PREFIX = """You are generating a SQL query for a user question, using only the schema context provided below.
 
-Return only the final SQL (no code fences, no explanation)."""
+Instructions:
+- Use only the tables and columns present in the schema context.
+- If the schema context lists a table with "(no confidently matched columns)", DO NOT invent column names for that table.
+- If the information required to answer the question is not available in the schema context, respond with the exact sentence:
+  "NO_SCHEMA_MATCH: No correct schema identified to answer the question."
+- Provide only the SQL query (no explanation) if you can produce a valid query using the provided schema.
+- Prefer safe, parameterized SELECT queries; never produce DDL or destructive statements.
+"""
+
+class Text2SQLAgent:
+    """SQL Generation Agent."""
+    
+    def __init__(self):
+        self.model = get_model(settings.GEMINI_MODEL, system_instruction=T2SQL_SYSTEM_INSTRUCTION)
+        self.cache = PromptCache()
+        self.semantic_cache = SemanticCache(f"text2sql:{PROMPT_VERSION}", threshold=SQL_SIMILARITY_THRESHOLD)
+    
+    def generate_sql(self, state: GraphState, on_token: Optional[Callable[[str], None]] = None) -> GraphState:
+        """Generate SQL query from natural language.
+
+        With on_token, the response is streamed and the callback receives the
+        text generated so far after every chunk.
+        """
+        user_query = state["user_query"]
+        schema_context = state.get("schema_context", "")
+        
+        logger.info("Generating SQL for: %.200s", user_query)
         
         try:
-            response = self.model.generate_content(prompt)
-            sql_query = response.text.strip()
-            
-            # Extract SQL from markdown code blocks if present
-            if "```sql" in sql_query:
-                sql_query = sql_query.split("```sql")[1].split("```")[0].strip()
-            elif "```" in sql_query:
-                sql_query = sql_query.split("```")[1].split("```")[0].strip()
-            
-            # Sanitize and format
-            sql_query = sanitize_sql(sql_query)
-            sql_query = ensure_top_limit(sql_query, limit=100)
-            
-            state["generated_sql"] = sql_query
-            state["step"] = "sql_generated"
-            
-            logger.info(f"Generated SQL: {sql_query}")
-            
+            normalized = normalize_query(user_query)
+            schema_scope = hashlib.sha1(schema_context.encode()).hexdigest()
+            cache_key = PromptCache.make_key(PROMPT_VERSION, normalized, schema_scope)
+            result_text = self.cache.get(cache_key)
+            if result_text is None:
+                semantic_scope = self._semantic_scope(user_query, schema_scope)
+                embedding = self.semantic_cache.embed(normalized) if settings.T2SQL_SEMANTIC_CACHE else None
+                result_text = self.semantic_cache.lookup(embedding, semantic_scope)
+                generated = result_text is None
+                if generated:
+                    prompt = self._build_prompt(user_query, schema_context)
+                    if on_token is not None:
+                        result_text = self._stream(prompt, on_token)
+                    else:
+                        # Concurrent sessions asking the same thing share one call
+                        result_text = llm_batcher.submit(self.model, prompt).result()
+                if self._apply_response(state, result_text):
+                    self._remember(cache_key, result_text, embedding if generated else None, semantic_scope)
+            else:
+                self._apply_response(state, result_text)
         except Exception as e:
-            logger.error(f"SQL generation error: {str(e)}")
-            state["error"] = f"SQL generation failed: {str(e)}"
-            state["step"] = "error"
+            self._apply_error(state, e)
         
         return state
+    
+    async def generate_sql_async(self, state: GraphState, on_token: Optional[Callable[[str], None]] = None) -> GraphState:
+        """Async variant of generate_sql, used when the graph runs through ainvoke()."""
+        user_query = state["user_query"]
+        schema_context = state.get("schema_context", "")
+        
+        logger.info("Generating SQL for: %.200s", user_query)
+        
+        try:
+            normalized = normalize_query(user_query)
+            schema_scope = hashlib.sha1(schema_context.encode()).hexdigest()
+            cache_key = PromptCache.make_key(PROMPT_VERSION, normalized, schema_scope)
+            result_text = self.cache.get(cache_key)
+            if result_text is None:
+                semantic_scope = self._semantic_scope(user_query, schema_scope)
+                embedding = (
+                    await asyncio.to_thread(self.semantic_cache.embed, normalized)
+                    if settings.T2SQL_SEMANTIC_CACHE else None
+                )
+                result_text = self.semantic_cache.lookup(embedding, semantic_scope)
+                generated = result_text is None
+                if generated:
+                    prompt = self._build_prompt(user_query, schema_context)
+                    if on_token is not None:
+                        # Streamed and cut off after the first complete SQL block
+                        result_text = await stream_async(
+                            self.model, prompt, stop=_CLOSED_FENCE_RE.search, on_token=on_token
+                        )
+                    else:
+                        result_text = await asyncio.wrap_future(llm_batcher.submit(self.model, prompt))
+                if self._apply_response(state, result_text):
+                    self._remember(cache_key, result_text, embedding if generated else None, semantic_scope)
+            else:
+                self._apply_response(state, result_text)
+        except Exception as e:
+            self._apply_error(state, e)
+        
+        return state
+    
+    def _stream(self, prompt: str, on_token: Callable[[str], None]) -> str:
+        text = ""
+        for chunk in self.model.generate_content(prompt, stream=True):
+            text += chunk.text
+            on_token(text)
+            if _CLOSED_FENCE_RE.search(text):
+                break
+        return text
+    
+    @staticmethod
+    def _semantic_scope(user_query: str, schema_scope: str) -> str:
+        # Paraphrases only share SQL when they name the same literals ("top 5" never answers "top 10")
+        return "\x1f".join([schema_scope, *query_literals(user_query)])
+    
+    def _build_prompt(self, user_query: str, schema_context: str) -> str:
+        return f"""SCHEMA (authoritative):
+{schema_context}
+
+USER REQUEST:
+{user_query}
+"""
+    
+    def _remember(self, cache_key: str, result_text: str, embedding: Optional[np.ndarray], semantic_scope: str):
+        # Called only for responses that passed the safety check, so a rejected answer is regenerated next time
+        if embedding is not None:
+            self.semantic_cache.store(embedding, result_text, semantic_scope)
+        self.cache.set(cache_key, result_text)
+    
+    def _apply_response(self, state: GraphState, result_text: str) -> bool:
+        """Store the cleaned SQL in state; returns whether it passes the validator's safety check."""
+        sql_query = result_text.strip()
+        
+        # Extract SQL from markdown code blocks if present
+        match = _FENCE_RE.search(sql_query)
+        if match:
+            sql_query = match.group(1).strip()
+        
+        # Strip comments; formatting for display happens in the UI
+        sql_query = sanitize_sql_for_exec(sql_query)
+        sql_query = ensure_top_limit(sql_query, limit=100)
+        
+        state["generated_sql"] = sql_query
+        state["step"] = "sql_generated"
+        
+        logger.info("Generated SQL (%d chars): %.400s", len(sql_query), sql_query)
+        return is_safe_query(sql_query)[0]
+    
+    def _apply_error(self, state: GraphState, e: Exception):
+        logger.error("SQL generation error: %s", e)
+        state["error"] = f"SQL generation failed: {str(e)}"
+        state["step"] = "error"
 
 def generate_sql(state: dict) -> dict:
     """
@@ -89,44 +211,35 @@ def generate_sql(state: dict) -> dict:
         return state
 
     # Build a strict prompt that forbids inventing tables/columns
-    prompt = f"""
-You are generating a SQL query for the following user question:
-User question: {state.get('user_query')}
-
+    prompt = CONSERVATIVE_SYSTEM_PREFIX + f"""
 Schema context (ONLY use these tables/columns; DO NOT invent any table or column names):
 {state.get('schema_context')}
 
-Instructions:
-- Use only the tables and columns present in the schema context above.
-- If the schema context lists a table with "(no confidently matched columns)", DO NOT invent column names for that table.
-- If the information required to answer the question is not available in the schema context, respond with the exact sentence:
-  "NO_SCHEMA_MATCH: No correct schema identified to answer the question."
-- Provide only the SQL query (no explanation) if you can produce a valid query using the provided schema.
-- Prefer safe, parameterized SELECT queries; never produce DDL or destructive statements.
+User question: {state.get('user_query')}
 """
 
     try:
         sql_query = None
-        response = text2sql_agent.model.generate_content(prompt)
+        # Plain model: the conservative instructions are part of this prompt
+        response = get_model(settings.GEMINI_MODEL).generate_content(prompt)
         sql_query = response.text.strip()
         
         # Extract SQL from markdown code blocks if present
-        if "```sql" in sql_query:
-            sql_query = sql_query.split("```sql")[1].split("```")[0].strip()
-        elif "```" in sql_query:
-            sql_query = sql_query.split("```")[1].split("```")[0].strip()
+        match = _FENCE_RE.search(sql_query)
+        if match:
+            sql_query = match.group(1).strip()
         
-        # Sanitize and format
-        sql_query = sanitize_sql(sql_query)
+        # Strip comments; formatting for display happens in the UI
+        sql_query = sanitize_sql_for_exec(sql_query)
         sql_query = ensure_top_limit(sql_query, limit=100)
         
         state["generated_sql"] = sql_query
         state["step"] = "sql_generated"
         
-        logger.info(f"Generated SQL: {sql_query}")
+        logger.info("Generated SQL (%d chars): %.400s", len(sql_query), sql_query)
         
     except Exception as e:
-        logger.error(f"SQL generation error: {str(e)}")
+        logger.error("SQL generation error: %s", e)
         state["error"] = f"SQL generation failed: {str(e)}"
         state["step"] = "error"
     
@@ -1,8 +1,9 @@
 """SQL Validator and Safety Agent."""
 from typing import Dict, Any
+from config.settings import settings
 from graph.state import GraphState
 from utils.logger import setup_logger
-from utils.helpers import is_safe_query, extract_tables_from_query
+from utils.helpers import is_safe_query, extract_tables_from_query, row_count_query
 
 logger = setup_logger(__name__)
 
@@ -24,7 +25,7 @@ class ValidatorAgent:
                 state["validation_message"] = safety_message
                 state["safety_check"] = False
                 state["step"] = "validation_failed"
-                logger.warning(f"Query failed safety check: {safety_message}")
+                logger.warning("Query failed safety check: %s", safety_message)
                 return state
             
             # Extract tables used
@@ -44,11 +45,14 @@ class ValidatorAgent:
             state["safety_check"] = True
             state["step"] = "validated"
             state["requires_human_approval"] = True
+            # The executor runs this alongside the capped read, for the total when the cap is hit
+            count_sql = row_count_query(sql_query, settings.MAX_RESULT_ROWS)
+            state["pending_sql"] = [count_sql] if count_sql else []
             
             logger.info("SQL query validated successfully")
             
         except Exception as e:
-            logger.error(f"Validation error: {str(e)}")
+            logger.error("Validation error: %s", e)
             state["is_valid"] = False
             state["validation_message"] = f"Validation error: {str(e)}"
             state["safety_check"] = False
@@ -1,8 +1,11 @@
 """Main Streamlit application for Text-to-SQL."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 from typing import Dict, Any
-from graph.workflow import text2sql_workflow
+from graph.workflow import run_workflow
 from graph.state import GraphState
 from database.connection import db_connection
 from database.schema_cache import schema_cache
@@ -21,6 +24,32 @@ from config.settings import settings
 
 logger = setup_logger(__name__)
 
+# Defaults for a new run; sequences are empty tuples so runs never share a mutable list
+_INITIAL_STATE_TEMPLATE: GraphState = {
+    "user_query": "",
+    "intent": None,
+    "entities": (),
+    "relevant_tables": (),
+    "schema_context": "",
+    "generated_sql": None,
+    "is_valid": False,
+    "validation_message": "",
+    "safety_check": False,
+    "execution_approved": False,
+    "pending_sql": (),
+    "query_results": None,
+    "query_results_preview": None,
+    "query_row_count": None,
+    "query_rows_truncated": False,
+    "pending_results": None,
+    "execution_error": None,
+    "formatted_response": None,
+    "messages": (),
+    "step": "start",
+    "error": None,
+    "requires_human_approval": False
+}
+
 # Page configuration
 st.set_page_config(
     page_title="Text-to-SQL Assistant",
@@ -45,6 +74,24 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_workflow_executor() -> ThreadPoolExecutor:
+    """Worker threads for workflow runs, shared across sessions and reruns."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="workflow")
+
+@st.cache_resource
+def warm_schema_cache() -> threading.Thread:
+    """Load the schema (refreshing it if stale) in the background, once per process."""
+    def warm():
+        try:
+            schema_cache.get_schema()
+        except Exception as e:
+            # The first question will retry; the app still works from whatever is cached
+            logger.warning("Schema warm-up failed: %s", e)
+    thread = threading.Thread(target=warm, name="schema-warmup", daemon=True)
+    thread.start()
+    return thread
+
 def initialize_session_state():
     """Initialize Streamlit session state."""
     if 'workflow_state' not in st.session_state:
@@ -53,6 +100,46 @@ def initialize_session_state():
         st.session_state.query_history = []
     if 'execution_approved' not in st.session_state:
         st.session_state.execution_approved = False
+    if 'pending_future' not in st.session_state:
+        st.session_state.pending_future = None
+    if 'sidebar_tasks' not in st.session_state:
+        # task name -> future, for database work started from the sidebar
+        st.session_state.sidebar_tasks = {}
+
+def submit_sidebar_task(name: str, fn):
+    """Run fn in the background unless a task with the same name is still running."""
+    task = st.session_state.sidebar_tasks.get(name)
+    if task is None or task.done():
+        st.session_state.sidebar_tasks[name] = get_workflow_executor().submit(fn)
+
+def refresh_schema_from_db():
+    # Forced refresh: the loaded schema is only replaced once the new one has been read
+    return schema_cache.get_schema(force_refresh=True)
+
+def display_sidebar_tasks():
+    """Show the state of background connection tests and schema refreshes."""
+    tasks = st.session_state.sidebar_tasks
+    if not tasks:
+        return
+    running = any(not task.done() for task in tasks.values())
+    with st.status("Working on the database..." if running else "Database tasks finished", state="running" if running else "complete", expanded=True):
+        connection_task = tasks.get("connection")
+        if connection_task is not None:
+            if not connection_task.done():
+                st.write("⏳ Testing database connection...")
+            elif connection_task.exception() is None and connection_task.result():
+                st.success("✅ Connected to MS SQL Server")
+            else:
+                # do not stop — allow offline generation using schema cache
+                st.error("❌ Database connection failed. Using cached schema for SQL generation.")
+        schema_task = tasks.get("schema")
+        if schema_task is not None:
+            if not schema_task.done():
+                st.write("⏳ Refreshing schema from database...")
+            elif schema_task.exception() is None:
+                st.success("Schema refreshed from DB!")
+            else:
+                st.error(f"Failed to refresh schema: {schema_task.exception()}")
 
 def main():
     """Main application function."""
@@ -71,12 +158,7 @@ def main():
         st.info("Database connection not required to generate SQL. Use cached schema or test connection manually.")
         conn_test = st.button("🔎 Test DB Connection", use_container_width=True)
         if conn_test:
-            with st.spinner("Testing database connection..."):
-                if db_connection.test_connection():
-                    st.success("✅ Connected to MS SQL Server")
-                else:
-                    st.error("❌ Database connection failed. Using cached schema for SQL generation.")
-                    # do not stop — allow offline generation using schema cache
+            submit_sidebar_task("connection", db_connection.test_connection)
         
         # Schema information
         st.subheader("Database Schema")
@@ -86,9 +168,7 @@ def main():
             col_a, col_b = st.columns([1,1])
             with col_a:
                 if st.button("Load schema from DB", use_container_width=True):
-                    with st.spinner("Refreshing schema from database..."):
-                        schema_cache.refresh_schema()
-                        st.success("Schema refreshed from DB!")
+                    submit_sidebar_task("schema", refresh_schema_from_db)
             with col_b:
                 if st.button("Load schema from Excel", use_container_width=True):
                     with st.spinner("Loading schema from Excel..."):
@@ -105,11 +185,19 @@ def main():
                     except Exception as e:
                         st.error(f"Failed to load manual schema: {e}")
         if st.button("🔄 Refresh Schema Cache"):
-            with st.spinner("Refreshing schema cache..."):
-                schema_cache.refresh_schema()
-                st.success("Schema cache refreshed!")
+            submit_sidebar_task("schema", refresh_schema_from_db)
+        display_sidebar_tasks()
         
-        schema = schema_cache.get_schema()
+        if schema_cache.refreshing and schema_cache.cache.get('tables'):
+            # A refresh (sidebar button or startup warm-up) holds the schema lock; show what is loaded
+            # instead of waiting on it, and block only when there is nothing to show yet
+            schema = schema_cache.cache
+        else:
+            try:
+                schema = schema_cache.get_schema()
+            except Exception as e:
+                st.warning(f"No schema loaded: {e}")
+                schema = {}
         tables = list(schema.get('tables', {}).keys())
         st.info(f"📊 Tables: {len(tables)}")
         for table in tables:
@@ -191,39 +279,42 @@ def main():
         """)
     
     # Process query
-    if submit_button and user_query:
+    if submit_button and user_query and st.session_state.pending_future is None:
         st.session_state.query_history.append(user_query)
         
-        with st.spinner("🤖 Processing your query..."):
+        # Initialize state; "messages" is the one list agents append to in place
+        initial_state: GraphState = {**_INITIAL_STATE_TEMPLATE, "user_query": user_query, "messages": []}
+        
+        # Run workflow off the script thread; reruns poll the future below
+        st.session_state.pending_future = get_workflow_executor().submit(run_workflow, initial_state)
+        st.rerun()
+    
+    future = st.session_state.pending_future
+    if future is not None:
+        if future.done():
+            st.session_state.pending_future = None
             try:
-                # Initialize state
-                initial_state: GraphState = {
-                    "user_query": user_query,
-                    "intent": None,
-                    "entities": [],
-                    "relevant_tables": [],
-                    "schema_context": "",
-                    "generated_sql": None,
-                    "is_valid": False,
-                    "validation_message": "",
-                    "safety_check": False,
-                    "execution_approved": False,
-                    "query_results": None,
-                    "execution_error": None,
-                    "formatted_response": None,
-                    "messages": [],
-                    "step": "start",
-                    "error": None,
-                    "requires_human_approval": False
-                }
-                
-                # Run workflow
-                result = text2sql_workflow.invoke(initial_state)
-                st.session_state.workflow_state = result
-                
+                st.session_state.workflow_state = future.result()
             except Exception as e:
                 st.error(f"❌ Error processing query: {str(e)}")
-                logger.error(f"Workflow error: {str(e)}")
+                logger.error("Workflow error: %s", e)
+        else:
+            with st.spinner("🤖 Processing your query..."):
+                if st.button("⏹️ Cancel"):
+                    # A run that already started finishes in the background; its result is dropped
+                    future.cancel()
+                    st.session_state.pending_future = None
+                    # Record the cancellation so the result panel shows it in place of the previous run
+                    st.session_state.workflow_state = {
+                        **_INITIAL_STATE_TEMPLATE,
+                        "user_query": st.session_state.query_history[-1] if st.session_state.query_history else "",
+                        "messages": [],
+                        "step": "cancelled",
+                        "error": "cancelled",
+                    }
+                else:
+                    time.sleep(0.2)
+                    st.rerun()
     
     # Display results
     if st.session_state.workflow_state:
@@ -236,6 +327,9 @@ def main():
         
         st.divider()
         
+        if state.get("error") == "cancelled":
+            st.warning(f"⏹️ Query cancelled: {state['user_query']}")
+        
         # Intent and entities
         if state.get("intent"):
             col1, col2 = st.columns(2)
@@ -293,6 +387,17 @@ def main():
             
             # Results table
             display_results_table(state["query_results"])
+            if state.get("query_rows_truncated"):
+                shown = len(state['query_results'])
+                if state.get("query_row_count") is not None:
+                    st.caption(f"Showing the first {shown} of {state['query_row_count']} rows.")
+                else:
+                    st.caption(f"Showing the first {shown} rows; the query returned more.")
+    
+    # Keep polling while sidebar database tasks are running
+    if any(not task.done() for task in st.session_state.sidebar_tasks.values()):
+        time.sleep(0.2)
+        st.rerun()
 
 if __name__ == "__main__":
     # Validate secrets on startup
@@ -300,4 +405,5 @@ if __name__ == "__main__":
         st.error("❌ Missing required configuration. Please check your .env file.")
         st.stop()
     
+    warm_schema_cache()
     main()
\ No newline at end of file
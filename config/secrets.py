@@ -1,4 +1,5 @@
 """Secrets management for the application."""
+import functools
 import os
 from typing import Optional
 from config.settings import settings
@@ -26,8 +27,9 @@ class SecretsManager:
         }
     
     @staticmethod
+    @functools.cache
     def validate_secrets() -> bool:
-        """Validate all required secrets are present."""
+        """Validate all required secrets are present (checked once per process)."""
         try:
             SecretsManager.get_gemini_api_key()
             creds = SecretsManager.get_database_credentials()
@@ -1,5 +1,7 @@
 """Application configuration settings."""
+import functools
 import os
+from dataclasses import dataclass
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -9,12 +11,27 @@ PROJECT_ROOT_COMPUTED: Path = Path(__file__).resolve().parent.parent
 # Load environment variables from project root .env explicitly
 load_dotenv(PROJECT_ROOT_COMPUTED / ".env")
 
+@functools.cache
+def _build_database_url(server: str, database: str, username: str, password: str, encrypt: bool) -> str:
+    return (
+        f"DRIVER={{ODBC Driver 18 for SQL Server}};"
+        f"SERVER={server};"
+        f"DATABASE={database};"
+        f"UID={username};"
+        f"PWD={password};"
+        f"Encrypt={'yes' if encrypt else 'no'};"
+        f"TrustServerCertificate=yes;"
+    )
+
+@dataclass(frozen=True, slots=True)
 class Settings:
     """Application settings."""
     
     # Gemini Configuration
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+    MAX_CONCURRENT_LLM: int = int(os.getenv("MAX_CONCURRENT_LLM", "4"))
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "models/text-embedding-004")
     
     # Database Configuration (pymssql format)
     DB_SERVER: str = os.getenv("DB_SERVER", "trimstone-dev.database.windows.net")
@@ -22,10 +39,34 @@ class Settings:
     DB_USERNAME: str = os.getenv("DB_USERNAME", "trimstone")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
     DB_ENCRYPT: bool = os.getenv("DB_ENCRYPT", "true").lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    # "pymssql", or "pyodbc" to connect through ODBC Driver 18 using database_url
+    DB_DRIVER: str = os.getenv("DB_DRIVER", "pymssql").lower()
+    DB_FETCH_BATCH: int = int(os.getenv("DB_FETCH_BATCH", "1000"))
+    # Seconds to reuse execute_query SELECT results (catalog lookups, queued counts); 0 disables
+    QUERY_CACHE_TTL: int = int(os.getenv("QUERY_CACHE_TTL", "60"))
+    MAX_RESULT_ROWS: int = int(os.getenv("MAX_RESULT_ROWS", "10000"))
     
     # Application Settings
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))
+    SCHEMA_CACHE_PATH: Path = Path(os.getenv("SCHEMA_CACHE_PATH", str(PROJECT_ROOT_COMPUTED / ".cache" / "schema_cache.pickle")))
+    # Past this age a database-loaded schema is re-validated against a catalog checksum instead of refetched
+    SCHEMA_CHECK_INTERVAL: int = int(os.getenv("SCHEMA_CHECK_INTERVAL", "60"))
+    # Store approximate per-table row counts with the schema and show them to the LLM
+    PRECOMPUTE_METRICS: bool = os.getenv("PRECOMPUTE_METRICS", "true").lower() == "true"
+    
+    # LLM Response Cache
+    LLM_CACHE_PATH: Path = Path(os.getenv("LLM_CACHE_PATH", str(PROJECT_ROOT_COMPUTED / ".cache" / "llm_cache.sqlite3")))
+    PROMPT_CACHE_TTL: int = int(os.getenv("PROMPT_CACHE_TTL", str(7 * 24 * 3600)))
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_TTL: int = int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+    # Paraphrase tier of the SQL cache; off by default since near-identical questions can need different SQL
+    T2SQL_SEMANTIC_CACHE: bool = os.getenv("T2SQL_SEMANTIC_CACHE", "false").lower() == "true"
+    SCHEMA_EMBEDDINGS_ENABLED: bool = os.getenv("SCHEMA_EMBEDDINGS_ENABLED", "true").lower() == "true"
+    SCHEMA_EMBEDDINGS_PATH: Path = Path(os.getenv("SCHEMA_EMBEDDINGS_PATH", str(PROJECT_ROOT_COMPUTED / ".cache" / "schema_embeddings.npz")))
     
     # Project Root
     PROJECT_ROOT: Path = PROJECT_ROOT_COMPUTED
@@ -33,14 +74,8 @@ class Settings:
     @property
     def database_url(self) -> str:
         """Generate database connection string."""
-        return (
-            f"DRIVER={{ODBC Driver 18 for SQL Server}};"
-            f"SERVER={self.DB_SERVER};"
-            f"DATABASE={self.DB_DATABASE};"
-            f"UID={self.DB_USERNAME};"
-            f"PWD={self.DB_PASSWORD};"
-            f"Encrypt={'yes' if self.DB_ENCRYPT else 'no'};"
-            f"TrustServerCertificate=yes;"
+        return _build_database_url(
+            self.DB_SERVER, self.DB_DATABASE, self.DB_USERNAME, self.DB_PASSWORD, self.DB_ENCRYPT
         )
 
 settings = Settings()
\ No newline at end of file
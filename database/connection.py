@@ -1,22 +1,144 @@
 """Database connection management using pymssql."""
+import asyncio
+import hashlib
+import re
+import sys
+import threading
+import time
+import pandas as pd
 import pymssql
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Set, Tuple
 from contextlib import contextmanager
 from config.settings import settings
+from database.pool import ConnectionPool
+from database.result_set import ResultSet
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Single-quoted literals (with '' escapes); the capture group keeps them in re.split output
+_STRING_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+_SQL_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+# Object name after a keyword that reads from or writes to a table; bracketed and dotted names allowed
+_TABLE_REF_RE = re.compile(
+    r"\b(?:from|join|into|update|merge(?:\s+into)?|table)\s+((?:\[[^\]]+\]|[\w#@$]+)(?:\s*\.\s*(?:\[[^\]]+\]|[\w#@$]+))*)",
+    re.IGNORECASE,
+)
+
+def canonical_sql(query: str) -> str:
+    """Comment-, case- and whitespace-insensitive form of a statement; string literals are kept verbatim."""
+    parts = _STRING_LITERAL_RE.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE_RE.sub(" ", _SQL_COMMENT_RE.sub(" ", parts[i])).lower()
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+def referenced_tables(query: str) -> frozenset:
+    """Lower-cased, unqualified names of the tables a statement reads or writes."""
+    names = set()
+    for match in _TABLE_REF_RE.finditer(_SQL_COMMENT_RE.sub(" ", query)):
+        name = match.group(1).rsplit(".", 1)[-1].strip().strip("[]").lower()
+        if name:
+            names.add(name)
+    return frozenset(names)
+
+class QueryResultCache:
+    """Small TTL + LRU cache of execute_query results, keyed by canonical SQL and its parameters.
+
+    Each entry remembers the tables its query read, so a write or schema change only
+    drops the entries that reference the tables it touched.
+    """
+    
+    def __init__(self, ttl: int, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (expires_at, rows, referenced tables)
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]], frozenset]]" = OrderedDict()
+        # table -> keys of the entries that read it
+        self._table_keys: Dict[str, Set[str]] = {}
+    
+    @staticmethod
+    def make_key(query: str, params: Optional[Tuple[Any, ...]]) -> str:
+        return hashlib.blake2b(repr((canonical_sql(query), params)).encode(), digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return list(entry[1])
+    
+    def set(self, key: str, rows: List[Dict[str, Any]], tables: frozenset = frozenset()):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, list(rows), tables)
+            for table in tables:
+                self._table_keys.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+    
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """Drop every entry that read one of the given tables; returns how many were dropped."""
+        with self._lock:
+            keys = set()
+            for table in tables:
+                keys |= self._table_keys.get(table, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._table_keys.clear()
+    
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[2]:
+            keys = self._table_keys.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._table_keys[table]
+
 class DatabaseConnection:
-    """MS SQL Server connection handler using pymssql."""
+    """MS SQL Server connection handler using pymssql (or pyodbc, see settings.DB_DRIVER)."""
     
     def __init__(self):
-        self._connection: Optional[pymssql.Connection] = None
+        if settings.DB_DRIVER == "pyodbc":
+            import pyodbc
+            self._pool = ConnectionPool(
+                self.connect, settings.DB_POOL_SIZE, (pyodbc.OperationalError, pyodbc.InterfaceError)
+            )
+        else:
+            self._pool = ConnectionPool(self.connect, settings.DB_POOL_SIZE)
+        self._result_cache = QueryResultCache(settings.QUERY_CACHE_TTL)
+        if settings.DB_POOL_MIN_SIZE > 0:
+            # Open the first sessions in the background; the app must start even when the DB is unreachable
+            threading.Thread(
+                target=self._pool.prewarm, args=(settings.DB_POOL_MIN_SIZE,), name="db-pool-prewarm", daemon=True
+            ).start()
     
     def connect(self) -> pymssql.Connection:
-        """Establish database connection."""
+        """Open a new database connection."""
         try:
-            self._connection = pymssql.connect(
+            if settings.DB_DRIVER == "pyodbc":
+                import pyodbc
+                # Rows come back as tuples; _normalize_rows keys them by cursor.description
+                connection = pyodbc.connect(settings.database_url, autocommit=True)
+                logger.info("Database connection established successfully (pyodbc)")
+                return connection
+            connection = pymssql.connect(
                 server=settings.DB_SERVER,
                 user=settings.DB_USERNAME,
                 password=settings.DB_PASSWORD,
@@ -26,83 +148,203 @@ class DatabaseConnection:
                 autocommit=True
             )
             logger.info("Database connection established successfully")
-            return self._connection
+            return connection
         except Exception as e:
-            logger.error(f"Failed to connect to database: {str(e)}")
+            logger.error("Failed to connect to database: %s", e)
             raise
     
     def disconnect(self):
-        """Close database connection."""
-        if self._connection:
-            self._connection.close()
-            logger.info("Database connection closed")
+        """Close all pooled database connections."""
+        self._pool.close_all()
+        logger.info("Database connections closed")
     
     @contextmanager
     def get_cursor(self):
-        """Context manager for database cursor."""
-        cursor = None
+        """Context manager for a cursor on a pooled connection."""
         try:
-            if not self._connection:
-                self.connect()
-            cursor = self._connection.cursor()
-            yield cursor
+            with self._pool.acquire() as connection:
+                cursor = connection.cursor()
+                cursor.arraysize = settings.DB_FETCH_BATCH
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
         except Exception as e:
-            logger.error(f"Database error: {str(e)}")
+            logger.error("Database error: %s", e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
     
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
-        """Execute SELECT query and return results."""
+    def execute_query(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> List[Dict[str, Any]]:
+        """Execute SELECT query and return results; `params` are bound to the driver's placeholders.
+
+        SELECT results are cached for QUERY_CACHE_TTL seconds; any other statement invalidates
+        the cached results of the tables it references.
+        """
+        is_select = query.lstrip()[:6].upper() == "SELECT"
+        cache_key = None
+        if settings.QUERY_CACHE_TTL > 0:
+            if is_select:
+                cache_key = QueryResultCache.make_key(query, params)
+                cached = self._result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            else:
+                self.invalidate_cached(referenced_tables(query))
+        
+        results = self._fetch_all(query, params)
+        if cache_key is not None:
+            self._result_cache.set(cache_key, results, referenced_tables(query))
+        return results
+    
+    def invalidate_cached(self, tables: Iterable[str]):
+        """Drop cached results that read any of `tables` (lower-cased, unqualified); all of them if none are given."""
+        tables = frozenset(tables)
+        if not tables:
+            # Nothing to target (e.g. a procedure call); fall back to dropping everything
+            self._result_cache.clear()
+            return
+        dropped = self._result_cache.invalidate_tables(tables)
+        logger.debug("Invalidated %d cached result(s) for tables %s", dropped, sorted(tables))
+    
+    def _fetch_all(self, query: str, params: Optional[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
         with self.get_cursor() as cursor:
-            cursor.execute(query)
-            # For as_dict=True, rows are already dicts keyed by column names. Some drivers may deliver
-            # unnamed columns; provide a fallback mapping to stable names.
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
             try:
-                results = cursor.fetchall()
-                if results and isinstance(results[0], dict):
-                    # Ensure all rows share the same keys; if any key is empty, rename it deterministically
-                    keys = list(results[0].keys())
-                    fixed_keys = []
-                    for idx, k in enumerate(keys):
-                        name = k if k and str(k).strip() != '' else f'column_{idx}'
-                        fixed_keys.append(name)
-                    if keys != fixed_keys:
-                        normalized = []
-                        for row in results:
-                            new_row = {}
-                            for i, original_key in enumerate(keys):
-                                new_row[fixed_keys[i]] = row.get(original_key)
-                            normalized.append(new_row)
-                        return normalized
-                    return results
-                # If not dicts, build dicts from cursor.description
-                desc = cursor.description or []
-                columns = []
-                for idx, col in enumerate(desc):
-                    name = col[0] if col and col[0] else None
-                    if not name or str(name).strip() == '':
-                        name = f'column_{idx}'
-                    columns.append(str(name))
-                return [dict(zip(columns, row)) for row in results]
+                results = []
+                while True:
+                    rows = cursor.fetchmany(cursor.arraysize)
+                    if not rows:
+                        break
+                    results.extend(rows)
+                return self._normalize_rows(cursor, results)
             except Exception as e:
-                logger.error(f"Failed to fetch results: {str(e)}")
+                logger.error("Failed to fetch results: %s", e)
                 raise
     
+    async def execute_query_async(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> List[Dict[str, Any]]:
+        """Async variant of execute_query; runs on a worker thread with its own pooled connection."""
+        return await asyncio.to_thread(self.execute_query, query, params)
+    
+    def execute_many(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """Execute independent SELECT queries in parallel, one pooled connection each."""
+        if len(queries) <= 1:
+            return [self.execute_query(q) for q in queries]
+        with ThreadPoolExecutor(max_workers=min(self._pool.size, len(queries))) as executor:
+            return list(executor.map(self.execute_query, queries))
+    
+    def execute_query_stream(self, query: str, batch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Execute SELECT query and yield result rows in batches of up to batch_size (default DB_FETCH_BATCH)."""
+        columns: Optional[List[str]] = None
+        with self.get_cursor() as cursor:
+            cursor.execute(query)
+            while True:
+                try:
+                    rows = cursor.fetchmany(batch_size or cursor.arraysize)
+                except Exception as e:
+                    logger.error("Failed to fetch results: %s", e)
+                    raise
+                if not rows:
+                    return
+                if isinstance(rows[0], dict):
+                    yield self._normalize_rows(cursor, rows)
+                else:
+                    # Tuple rows: resolve column names from the description once, not per batch
+                    if columns is None:
+                        columns = self._column_names(cursor)
+                    yield [dict(zip(columns, row)) for row in rows]
+    
+    def iter_query(self, query: str, batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Execute SELECT query and yield result rows, fetching batch_size rows at a time."""
+        for rows in self.execute_query_stream(query, batch_size):
+            yield from rows
+    
+    def execute_query_columnar(self, query: str, max_rows: Optional[int] = None) -> ResultSet:
+        """Execute SELECT query into a column-oriented ResultSet of at most max_rows rows.
+
+        Fetched batches are transposed straight into per-column lists; no per-row dicts are built.
+        """
+        max_rows = settings.MAX_RESULT_ROWS if max_rows is None else max_rows
+        columns: List[str] = []
+        keys: List[Any] = []
+        data: Dict[str, List[Any]] = {}
+        remaining = max_rows
+        with self.get_cursor() as cursor:
+            cursor.execute(query)
+            while remaining > 0:
+                rows = cursor.fetchmany(min(cursor.arraysize, remaining))
+                if not rows:
+                    break
+                if not columns:
+                    # Dict rows (pymssql as_dict) are read by key, tuple rows (pyodbc) by position
+                    if isinstance(rows[0], dict):
+                        keys = list(rows[0].keys())
+                        source = keys
+                    else:
+                        source = [col[0] for col in cursor.description or ()]
+                        keys = list(range(len(source)))
+                    columns = [
+                        str(name) if name and str(name).strip() != '' else f'column_{idx}'
+                        for idx, name in enumerate(source)
+                    ]
+                    data = {name: [] for name in columns}
+                for key, name in zip(keys, columns):
+                    data[name].extend(row[key] for row in rows)
+                remaining -= len(rows)
+        return ResultSet(columns, data)
+    
+    def execute_query_df(self, query: str, max_rows: Optional[int] = None) -> pd.DataFrame:
+        """Execute SELECT query into a DataFrame, constructed from per-column lists."""
+        result = self.execute_query_columnar(query, max_rows)
+        return pd.DataFrame(result.data, columns=result.columns, copy=False)
+    
+    def _normalize_rows(self, cursor, results: list) -> List[Dict[str, Any]]:
+        """Return fetched rows as dicts with non-empty column names."""
+        # For as_dict=True, rows are already dicts keyed by column names. Some drivers may deliver
+        # unnamed columns; provide a fallback mapping to stable names.
+        if results and isinstance(results[0], dict):
+            # Ensure all rows share the same keys; if any key is empty, rename it deterministically
+            rename = {
+                k: f'column_{idx}'
+                for idx, k in enumerate(results[0])
+                if not k or str(k).strip() == ''
+            }
+            if not rename:
+                return results
+            return [{rename.get(k, k): v for k, v in row.items()} for row in results]
+        # If not dicts, build dicts from cursor.description
+        columns = self._column_names(cursor)
+        return [dict(zip(columns, row)) for row in results]
+    
+    @staticmethod
+    def _column_names(cursor) -> List[str]:
+        """Column names from cursor.description, with blank ones replaced by column_<idx>."""
+        columns = []
+        for idx, col in enumerate(cursor.description or []):
+            name = col[0] if col and col[0] else None
+            if not name or str(name).strip() == '':
+                name = f'column_{idx}'
+            columns.append(str(name))
+        return columns
+    
     def get_table_schema(self, table_name: str) -> List[Dict[str, str]]:
         """Get schema information for a specific table."""
-        query = f"""
+        query = """
         SELECT 
             COLUMN_NAME as column_name,
             DATA_TYPE as data_type,
             IS_NULLABLE as is_nullable,
             CHARACTER_MAXIMUM_LENGTH as max_length
         FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_NAME = '{table_name}'
+        WHERE TABLE_NAME = {placeholder}
         ORDER BY ORDINAL_POSITION
-        """
-        return self.execute_query(query)
+        """.format(placeholder="?" if settings.DB_DRIVER == "pyodbc" else "%s")
+        return self.execute_query(query, (table_name,))
+    
+    async def get_table_schema_async(self, table_name: str) -> List[Dict[str, str]]:
+        """Async variant of get_table_schema, so several tables can be fetched with asyncio.gather."""
+        return await asyncio.to_thread(self.get_table_schema, table_name)
     
     def get_all_tables(self) -> List[str]:
         """Get list of all tables in the database."""
@@ -115,6 +357,102 @@ class DatabaseConnection:
         results = self.execute_query(query)
         return [row['TABLE_NAME'] for row in results]
     
+    def get_full_schema(self) -> Dict[str, Dict[str, Any]]:
+        """Get columns, primary keys and foreign keys for every base table in one round-trip."""
+        query = """
+        SELECT
+            c.TABLE_NAME as table_name,
+            c.COLUMN_NAME as column_name,
+            c.DATA_TYPE as data_type,
+            c.IS_NULLABLE as is_nullable,
+            c.CHARACTER_MAXIMUM_LENGTH as max_length
+        FROM INFORMATION_SCHEMA.COLUMNS c
+        JOIN INFORMATION_SCHEMA.TABLES t
+            ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+        WHERE t.TABLE_TYPE = 'BASE TABLE'
+        ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION;
+
+        SELECT kcu.TABLE_NAME as table_name, kcu.COLUMN_NAME as column_name
+        FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+        JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
+            ON tc.CONSTRAINT_SCHEMA = kcu.CONSTRAINT_SCHEMA AND tc.CONSTRAINT_NAME = kcu.CONSTRAINT_NAME
+        WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+        ORDER BY kcu.TABLE_NAME, kcu.ORDINAL_POSITION;
+
+        SELECT
+            fk.TABLE_NAME as table_name,
+            fk.COLUMN_NAME as column_name,
+            pk.TABLE_NAME as referenced_table,
+            pk.COLUMN_NAME as referenced_column
+        FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS rc
+        JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE fk
+            ON rc.CONSTRAINT_SCHEMA = fk.CONSTRAINT_SCHEMA AND rc.CONSTRAINT_NAME = fk.CONSTRAINT_NAME
+        JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE pk
+            ON rc.UNIQUE_CONSTRAINT_SCHEMA = pk.CONSTRAINT_SCHEMA
+            AND rc.UNIQUE_CONSTRAINT_NAME = pk.CONSTRAINT_NAME
+            AND fk.ORDINAL_POSITION = pk.ORDINAL_POSITION
+        ORDER BY fk.TABLE_NAME, fk.ORDINAL_POSITION
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute(query)
+            # Normalized per result set: pyodbc returns tuples, and cursor.description changes with each set
+            column_rows = self._normalize_rows(cursor, cursor.fetchall())
+            cursor.nextset()
+            pk_rows = self._normalize_rows(cursor, cursor.fetchall())
+            cursor.nextset()
+            fk_rows = self._normalize_rows(cursor, cursor.fetchall())
+        
+        tables: Dict[str, Dict[str, Any]] = {}
+        for table_name, rows in groupby(column_rows, key=lambda r: r['table_name']):
+            rows = list(rows)
+            # Parallel per-column lists, the layout the schema cache stores
+            tables[table_name] = {
+                'column_names': [row['column_name'] for row in rows],
+                'data_types': [row['data_type'] for row in rows],
+                'is_nullable': [row['is_nullable'] for row in rows],
+                'max_lengths': [row['max_length'] for row in rows],
+                'primary_key': [],
+                'foreign_keys': [],
+            }
+        for row in pk_rows:
+            if row['table_name'] in tables:
+                tables[row['table_name']]['primary_key'].append(row['column_name'])
+        for row in fk_rows:
+            if row['table_name'] in tables:
+                tables[row['table_name']]['foreign_keys'].append({
+                    'column_name': row['column_name'],
+                    'referenced_table': row['referenced_table'],
+                    'referenced_column': row['referenced_column'],
+                })
+        return tables
+    
+    def get_row_counts(self) -> Dict[str, int]:
+        """Approximate row count of every base table, read from partition metadata rather than COUNT(*)."""
+        query = """
+        SELECT t.name AS table_name, SUM(p.rows) AS row_count
+        FROM sys.tables t
+        JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+        GROUP BY t.name
+        """
+        # Bypasses the result cache: counts are only read while the schema is being refreshed.
+        # One row per table, so no row cap; the columnar read skips building a dict per row
+        counts = self.execute_query_df(query, max_rows=sys.maxsize)
+        if counts.empty:
+            return {}
+        return dict(zip(counts['table_name'], counts['row_count'].astype('int64').tolist()))
+    
+    def get_schema_fingerprint(self) -> Tuple[Optional[int], int]:
+        """Checksum over every table's id and modify_date; changes whenever a table is created, altered or dropped."""
+        query = """
+        SELECT CHECKSUM_AGG(CHECKSUM(object_id, modify_date)) AS fingerprint, COUNT(*) AS table_count
+        FROM sys.tables
+        """
+        # Bypasses the result cache: a cached checksum would hide the change it exists to detect
+        row = self._fetch_all(query, None)[0]
+        # COUNT is folded in so that an empty database and a NULL aggregate still compare;
+        # the raw pair is returned because hash() of None is not stable across processes
+        return (row['fingerprint'], row['table_count'])
+    
     def test_connection(self) -> bool:
         """Test database connection."""
         try:
@@ -123,7 +461,7 @@ class DatabaseConnection:
                 cursor.execute("SELECT 1 AS result")
                 return True
         except Exception as e:
-            logger.error(f"Connection test failed: {str(e)}")
+            logger.error("Connection test failed: %s", e)
             return False
 
 # Global database connection instance
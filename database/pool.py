@@ -0,0 +1,106 @@
+"""Thread-safe pool of database connections."""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Tuple, Type
+import pymssql
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Connections idle longer than this are pinged before reuse
+IDLE_CHECK_SECONDS = 60
+
+class ConnectionPool:
+    """Bounded pool of reusable pymssql connections.
+
+    At most `size` connections are checked out at once; further callers block
+    until one is returned. Connections are opened lazily by `factory`. The
+    most recently returned connection is handed out first, so a few warm
+    sessions serve most requests and the rest can time out server-side.
+    """
+    
+    def __init__(
+        self,
+        factory: Callable[[], pymssql.Connection],
+        size: int,
+        connection_errors: Tuple[Type[BaseException], ...] = (pymssql.OperationalError, pymssql.InterfaceError),
+    ):
+        self.size = size
+        self._factory = factory
+        # Errors after which a connection is closed rather than returned to the pool
+        self._connection_errors = connection_errors
+        # (connection, time it was returned to the pool)
+        self._idle: "queue.LifoQueue[Tuple[pymssql.Connection, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+    
+    @contextmanager
+    def acquire(self):
+        """Check out a connection and return it to the pool afterwards."""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except self._connection_errors:
+                # Drivers raise these for ordinary statement errors too (pymssql: OperationalError
+                # for most server errors), so only drop the session if it no longer answers a ping
+                if self._is_alive(conn):
+                    self._idle.put((conn, time.monotonic()))
+                else:
+                    logger.info("Dropping broken pooled connection")
+                    self._discard(conn)
+                raise
+            except BaseException:
+                self._idle.put((conn, time.monotonic()))
+                raise
+            else:
+                self._idle.put((conn, time.monotonic()))
+    
+    def prewarm(self, min_size: int):
+        """Open connections until at least min_size are idle; stops at the first failure."""
+        for _ in range(min(min_size, self.size) - self._idle.qsize()):
+            try:
+                conn = self._factory()
+            except Exception as e:
+                logger.warning("Connection pool pre-warm stopped: %s", e)
+                return
+            self._idle.put((conn, time.monotonic()))
+    
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+    
+    def _checkout(self) -> pymssql.Connection:
+        while True:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._factory()
+            if time.monotonic() - returned_at < IDLE_CHECK_SECONDS or self._is_alive(conn):
+                return conn
+            logger.info("Dropping stale pooled connection")
+            self._discard(conn)
+    
+    def _is_alive(self, conn: pymssql.Connection) -> bool:
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1 AS ping")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+    
+    def _discard(self, conn: pymssql.Connection):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning("Failed to close pooled connection: %s", e)
@@ -0,0 +1,18 @@
+"""Column-oriented query results."""
+from typing import Any, Dict, List
+
+class ResultSet:
+    """Query result stored as one list per column rather than one dict per row."""
+    
+    __slots__ = ("columns", "data")
+    
+    def __init__(self, columns: List[str], data: Dict[str, List[Any]]):
+        self.columns = columns
+        self.data = data
+    
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Row-dict view for callers that expect execute_query's shape."""
+        return [dict(zip(self.columns, row)) for row in zip(*(self.data[c] for c in self.columns))]
\ No newline at end of file
@@ -1,50 +1,374 @@
 """Schema caching mechanism."""
+import functools
 import json
+import operator
+import os
+import pickle
+import sys
+import tempfile
+import threading
 import time
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, List, Optional
 from pathlib import Path
 from config.settings import settings
 from database.connection import db_connection
 from utils.logger import setup_logger
-import pandas as pd
+import openpyxl
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
 
 logger = setup_logger(__name__)
 
+# Runs the metadata queries that accompany a schema refresh
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="schema-refresh")
+
+# Spreadsheet spellings of "nullable"
+_YES_VALUES = frozenset({'YES', 'Y', 'TRUE', '1'})
+
+def _header_index(header_row) -> Dict[str, int]:
+    """Lower-cased header -> column index; the first occurrence of a repeated header wins."""
+    mapping: Dict[str, int] = {}
+    for idx, value in enumerate(header_row):
+        if value is not None:
+            mapping.setdefault(str(value).strip().lower(), idx)
+    return mapping
+
+def _cell(row, idx: int) -> Any:
+    # Read-only rows can be shorter than the header when trailing cells are empty
+    return row[idx] if idx < len(row) else None
+
+def _columnar(table_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a legacy table entry (a 'columns' list of dicts) to parallel column lists, in place."""
+    columns = table_info.pop('columns', None)
+    if columns is not None:
+        table_info['column_names'] = [sys.intern(str(col['column_name'])) for col in columns]
+        table_info['data_types'] = [col['data_type'] for col in columns]
+        table_info['is_nullable'] = [col.get('is_nullable', 'YES') for col in columns]
+        if any('max_length' in col for col in columns):
+            table_info['max_lengths'] = [col.get('max_length') for col in columns]
+    return table_info
+
+def _changed_tables(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> set:
+    """Lower-cased names of tables added, dropped, altered or resized between two schemas.
+
+    A structural change also names the INFORMATION_SCHEMA views that column and table lookups read.
+    """
+    changed = set()
+    structural = False
+    for name in old.keys() | new.keys():
+        before, after = old.get(name), new.get(name)
+        if (
+            before is None
+            or after is None
+            or before['column_names'] != after['column_names']
+            or before['data_types'] != after['data_types']
+        ):
+            structural = True
+            changed.add(name.lower())
+        elif before.get('row_count') != after.get('row_count'):
+            changed.add(name.lower())
+    if structural:
+        changed |= {'columns', 'tables'}
+    return changed
+
+def _manual_table(pairs: list[tuple[str, str]]) -> dict[str, Any]:
+    return {
+        'column_names': [name for name, _ in pairs],
+        'data_types': [dtype for _, dtype in pairs],
+        'is_nullable': ["YES"] * len(pairs),
+    }
+
+@functools.lru_cache(maxsize=1)
+def _read_schema_workbook(path: str, mtime_ns: int) -> Dict[str, Dict[str, Any]]:
+    """Parse a schema workbook into the cache's 'tables' mapping; memoized on (path, mtime)."""
+    # Read-only mode streams rows straight from the sheet XML; no DataFrames are built
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    tables: Dict[str, Dict[str, Any]] = {}
+    try:
+        worksheets = workbook.worksheets
+        if len(worksheets) == 1:
+            worksheet = worksheets[0]
+            mapping = _header_index(next(worksheet.iter_rows(max_row=1, values_only=True), ()))
+            required = {"table_name", "column_name", "data_type", "is_nullable"}
+            missing = required - mapping.keys()
+            if missing:
+                raise ValueError(f"Excel missing required columns: {missing}")
+            indices = [mapping[col] for col in ("table_name", "column_name", "data_type", "is_nullable")]
+            pick = operator.itemgetter(*indices)
+            width = max(indices) + 1
+            # Cells right of the last needed column are never read
+            rows = worksheet.iter_rows(min_row=2, max_col=width, values_only=True)
+            grouped: Dict[str, Dict[str, List[Any]]] = {}
+            # Rows for one table are normally contiguous: resolve its lists once per run, and
+            # normalize each distinct is_nullable spelling once
+            current_table = None
+            nullable_flags: Dict[Any, str] = {}
+            for row in rows:
+                if len(row) < width:
+                    row = (*row, *(None,) * (width - len(row)))
+                table_name, column_name, data_type, is_nullable = pick(row)
+                if table_name is None:
+                    continue
+                if table_name != current_table:
+                    current_table = table_name
+                    table = grouped.setdefault(
+                        sys.intern(str(table_name)), {'column_names': [], 'data_types': [], 'is_nullable': []}
+                    )
+                    append_name = table['column_names'].append
+                    append_type = table['data_types'].append
+                    append_nullable = table['is_nullable'].append
+                flag = nullable_flags.get(is_nullable)
+                if flag is None:
+                    flag = nullable_flags[is_nullable] = (
+                        'YES' if str(is_nullable).strip().upper() in _YES_VALUES else 'NO'
+                    )
+                append_name(sys.intern(str(column_name)))
+                append_type(str(data_type))
+                append_nullable(flag)
+            # Sorted by table name, as the previous groupby-based loader produced them
+            tables = dict(sorted(grouped.items()))
+        else:
+            # Sheet per table
+            for worksheet in worksheets:
+                mapping = _header_index(next(worksheet.iter_rows(max_row=1, values_only=True), ()))
+                def get(*cols):
+                    # Index of the first header present among the aliases
+                    for col in cols:
+                        if col in mapping:
+                            return mapping[col]
+                    return None
+                name_idx = get('column_name', 'column', 'name')
+                type_idx = get('data_type', 'type')
+                nullable_idx = get('is_nullable', 'nullable')
+                if name_idx is None or type_idx is None:
+                    logger.warning("Sheet %s missing required columns; skipping", worksheet.title)
+                    continue
+                width = max(idx for idx in (name_idx, type_idx, nullable_idx) if idx is not None) + 1
+                column_names = []
+                data_types = []
+                nullables = []
+                for row in worksheet.iter_rows(min_row=2, max_col=width, values_only=True):
+                    column_name = _cell(row, name_idx)
+                    if column_name is None:
+                        continue
+                    is_nullable = _cell(row, nullable_idx) if nullable_idx is not None else 'YES'
+                    column_names.append(sys.intern(str(column_name)))
+                    data_types.append(str(_cell(row, type_idx)))
+                    nullables.append('YES' if str(is_nullable).strip().upper() in _YES_VALUES else 'NO')
+                tables[sys.intern(worksheet.title)] = {
+                    'column_names': column_names,
+                    'data_types': data_types,
+                    'is_nullable': nullables,
+                }
+    finally:
+        workbook.close()
+    return tables
+
+# Predefined schema for the client, contacts and project tables, built once at import.
+# load_manual_schema shares these dicts between calls; treat them as read-only.
+_MANUAL_SCHEMA_TABLES: Dict[str, Dict[str, Any]] = {
+    'client': _manual_table([
+        ("id", "INT"),
+        ("name", "NVARCHAR(255)"),
+        ("slug", "NVARCHAR(255)"),
+        ("email", "NVARCHAR(255)"),
+        ("phone", "NVARCHAR(50)"),
+        ("address1", "NVARCHAR(255)"),
+        ("address2", "NVARCHAR(255)"),
+        ("city", "NVARCHAR(100)"),
+        ("state", "NVARCHAR(100)"),
+        ("country", "NVARCHAR(100)"),
+        ("zipcode", "NVARCHAR(20)"),
+        ("created_at", "DATETIME2"),
+        ("updated_at", "DATETIME2"),
+        ("team_id", "INT"),
+        ("channel_id", "INT"),
+        ("drive_id", "NVARCHAR(255)"),
+        ("delta_token", "NVARCHAR(255)"),
+        ("drive_item_id", "NVARCHAR(255)"),
+        ("hubspot_id", "NVARCHAR(255)"),
+        ("owner_name", "NVARCHAR(255)"),
+        ("status", "NVARCHAR(50)"),
+        ("industry", "NVARCHAR(100)"),
+        ("type", "NVARCHAR(50)"),
+        ("no_employees", "INT"),
+        ("description", "NVARCHAR(MAX)"),
+        ("timezone", "NVARCHAR(100)"),
+        ("created_by", "NVARCHAR(255)"),
+        ("client_number", "NVARCHAR(100)"),
+    ]),
+    'contacts': _manual_table([
+        ("id", "INT"),
+        ("first_name", "NVARCHAR(100)"),
+        ("last_name", "NVARCHAR(100)"),
+        ("email", "NVARCHAR(255)"),
+        ("owner", "NVARCHAR(255)"),
+        ("phone", "NVARCHAR(50)"),
+        ("mobile", "NVARCHAR(50)"),
+        ("stage", "NVARCHAR(50)"),
+        ("client_id", "INT"),
+        ("client_name", "NVARCHAR(255)"),
+        ("hubspot_id", "NVARCHAR(255)"),
+        ("created_at", "DATETIME2"),
+        ("updated_at", "DATETIME2"),
+    ]),
+    'project': _manual_table([
+        ("id", "INT"),
+        ("name", "NVARCHAR(255)"),
+        ("client_id", "INT"),
+        ("description", "NVARCHAR(MAX)"),
+        ("slug", "NVARCHAR(255)"),
+        ("category", "NVARCHAR(100)"),
+        ("status", "NVARCHAR(50)"),
+        ("priority", "NVARCHAR(50)"),
+        ("start_date", "DATE"),
+        ("end_date", "DATE"),
+        ("currency", "NVARCHAR(10)"),
+        ("budget", "DECIMAL(18,2)"),
+        ("created_by", "NVARCHAR(255)"),
+        ("updated_by", "NVARCHAR(255)"),
+        ("created_at", "DATETIME2"),
+        ("updated_at", "DATETIME2"),
+        ("billing_type", "NVARCHAR(50)"),
+        ("amount_billed", "DECIMAL(18,2)"),
+        ("budget_hours", "DECIMAL(18,2)"),
+        ("team_id", "INT"),
+        ("channel_id", "INT"),
+        ("drive_id", "NVARCHAR(255)"),
+        ("drive_subscription_id", "NVARCHAR(255)"),
+        ("delta_token", "NVARCHAR(255)"),
+        ("drive_item_id", "NVARCHAR(255)"),
+        ("hubspot_id", "NVARCHAR(255)"),
+        ("xero_id", "NVARCHAR(255)"),
+        ("owner_id", "INT"),
+        ("owner_email", "NVARCHAR(255)"),
+        ("last_modified_date", "DATE"),
+        ("project_number", "NVARCHAR(100)"),
+    ]),
+}
+
 class SchemaCache:
-    """Cache database schema information."""
+    """Cache database schema information; the cache file is read on first access, not at construction."""
     
     def __init__(self, cache_file: str = "schema_cache.json"):
+        # JSON is the checked-in seed and an export format; the pickle under .cache is what gets loaded and saved
         self.cache_file = settings.PROJECT_ROOT / cache_file
-        self.cache: Dict[str, Any] = {}
-        self.load_cache()
+        self.binary_cache_file = settings.SCHEMA_CACHE_PATH
+        self._cache: Optional[Dict[str, Any]] = None
+        self._name_index_source: Optional[Dict[str, Any]] = None
+        self._name_index: Dict[str, str] = {}
+        self._text_source: Optional[Dict[str, Any]] = None
+        self._text: str = ""
+        self._refresh_lock = threading.Lock()
+        # After a failed fingerprint query, fall back to CACHE_TTL until this monotonic time
+        self._fingerprint_retry_at = 0.0
+        # After a failed refresh, keep serving the loaded schema until this monotonic time
+        self._refresh_retry_at = 0.0
+    
+    @property
+    def cache(self) -> Dict[str, Any]:
+        if self._cache is None:
+            self._cache = {}
+            self.load_cache()
+        return self._cache
+    
+    @cache.setter
+    def cache(self, value: Dict[str, Any]):
+        self._cache = value
     
     def load_cache(self):
-        """Load cache from file."""
+        """Load cache from file, preferring the binary cache over the JSON seed."""
+        if self.binary_cache_file.exists():
+            try:
+                with open(self.binary_cache_file, 'rb') as f:
+                    self.cache = pickle.load(f)
+                self._upgrade_layout()
+                logger.info("Schema cache loaded successfully")
+                return
+            except Exception as e:
+                logger.warning("Failed to load binary cache, falling back to JSON: %s", e)
         if self.cache_file.exists():
             try:
-                with open(self.cache_file, 'r') as f:
-                    self.cache = json.load(f)
+                if orjson is not None:
+                    self.cache = orjson.loads(self.cache_file.read_bytes())
+                else:
+                    with open(self.cache_file, 'r') as f:
+                        self.cache = json.load(f)
+                self._upgrade_layout()
                 logger.info("Schema cache loaded successfully")
             except Exception as e:
-                logger.warning(f"Failed to load cache: {str(e)}")
+                logger.warning("Failed to load cache: %s", e)
                 self.cache = {}
     
+    def _upgrade_layout(self):
+        # Files written before the columnar layout (including the checked-in seed) store per-column dicts
+        for table_info in self.cache.get('tables', {}).values():
+            _columnar(table_info)
+    
     def save_cache(self):
         """Save cache to file."""
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=2, default=str)
+            self.binary_cache_file.parent.mkdir(parents=True, exist_ok=True)
+            self._atomic_write(self.binary_cache_file, 'wb', lambda f: pickle.dump(self.cache, f, protocol=5))
             logger.info("Schema cache saved successfully")
         except Exception as e:
-            logger.error(f"Failed to save cache: {str(e)}")
+            logger.error("Failed to save cache: %s", e)
+    
+    def export_json(self, path: Optional[Path] = None):
+        """Write the current schema as indented JSON (by default over the checked-in schema_cache.json)."""
+        path = Path(path or self.cache_file)
+        if orjson is not None:
+            data = orjson.dumps(self.cache, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY, default=str)
+            self._atomic_write(path, 'wb', lambda f: f.write(data))
+        else:
+            self._atomic_write(path, 'w', lambda f: json.dump(self.cache, f, indent=2, default=str))
+    
+    @staticmethod
+    def _atomic_write(path: Path, mode: str, write: Callable[[IO], None]):
+        # Write to a temp file and swap it in, so a crash mid-write never leaves a truncated cache
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
     
     def is_cache_valid(self) -> bool:
-        """Check if cache is still valid."""
+        """Check if cache is still valid.
+
+        Schemas read from the database carry a catalog fingerprint: once older than
+        SCHEMA_CHECK_INTERVAL they stay valid for as long as the fingerprint is unchanged.
+        Other schemas, or any schema while the fingerprint cannot be read, expire after CACHE_TTL.
+        """
         if not self.cache or 'timestamp' not in self.cache:
             return False
         
         cache_age = time.time() - self.cache['timestamp']
-        return cache_age < settings.CACHE_TTL
+        fingerprint = self.cache.get('fingerprint')
+        if isinstance(fingerprint, list):  # tuples come back as lists from the JSON seed
+            fingerprint = tuple(fingerprint)
+        if fingerprint is None or time.monotonic() < self._fingerprint_retry_at:
+            return cache_age < settings.CACHE_TTL
+        if cache_age < settings.SCHEMA_CHECK_INTERVAL:
+            return True
+        try:
+            current = db_connection.get_schema_fingerprint()
+        except Exception as e:
+            logger.warning("Schema fingerprint check failed, using CACHE_TTL: %s", e)
+            self._fingerprint_retry_at = time.monotonic() + settings.SCHEMA_CHECK_INTERVAL
+            return cache_age < settings.CACHE_TTL
+        if current != fingerprint:
+            logger.info("Database schema changed; cached schema is stale")
+            return False
+        # Unchanged: restart the check interval
+        self.cache['timestamp'] = time.time()
+        return True
     
     def refresh_schema(self) -> Dict[str, Any]:
         """Refresh schema information from database."""
@@ -56,21 +380,44 @@ class SchemaCache:
         }
         
         try:
-            tables = db_connection.get_all_tables()
+            # The fingerprint and count queries run on other pooled connections while the schema batch is in flight
+            fingerprint_future = _refresh_executor.submit(db_connection.get_schema_fingerprint)
+            row_counts_future = None
+            if settings.PRECOMPUTE_METRICS:
+                row_counts_future = _refresh_executor.submit(db_connection.get_row_counts)
+            tables = db_connection.get_full_schema()
             
-            for table in tables:
-                columns = db_connection.get_table_schema(table)
-                schema['tables'][table] = {
-                    'columns': columns,
-                    'column_names': [col['column_name'] for col in columns]
-                }
+            for table, table_info in tables.items():
+                # Intern identifiers: names like "id" or "created_at" repeat across many tables
+                table_info['column_names'] = [sys.intern(name) for name in table_info['column_names']]
+                schema['tables'][sys.intern(table)] = table_info
+            
+            try:
+                schema['fingerprint'] = fingerprint_future.result()
+            except Exception as e:
+                # Without a fingerprint the schema simply expires after CACHE_TTL
+                logger.warning("Failed to fetch schema fingerprint: %s", e)
+            
+            if row_counts_future is not None:
+                try:
+                    row_counts = row_counts_future.result()
+                except Exception as e:
+                    # Counts only enrich the prompt; a schema without them is still usable
+                    logger.warning("Failed to fetch table row counts: %s", e)
+                    row_counts = {}
+                for table, count in row_counts.items():
+                    if table in schema['tables']:
+                        schema['tables'][table]['row_count'] = count
             
+            changed = _changed_tables(self.cache.get('tables', {}), schema['tables'])
+            if changed:
+                db_connection.invalidate_cached(changed)
             self.cache = schema
             self.save_cache()
-            logger.info(f"Schema refreshed successfully. Found {len(tables)} tables.")
+            logger.info("Schema refreshed successfully. Found %s tables.", len(tables))
             
         except Exception as e:
-            logger.error(f"Failed to refresh schema: {str(e)}")
+            logger.error("Failed to refresh schema: %s", e)
             raise
         
         return schema
@@ -81,204 +428,116 @@ class SchemaCache:
         Expected layout: a sheet per table or a single sheet with columns
         [table_name, column_name, data_type, is_nullable].
         """
-        path = excel_path or (settings.PROJECT_ROOT / 'trimstone_final.xlsx')
-        logger.info(f"Loading schema from Excel: {path}")
-        schema = {
-            'timestamp': time.time(),
-            'tables': {}
-        }
+        path = Path(excel_path or (settings.PROJECT_ROOT / 'trimstone_final.xlsx'))
+        logger.info("Loading schema from Excel: %s", path)
         try:
-            xls = pd.ExcelFile(path)
-            if len(xls.sheet_names) == 1:
-                df = pd.read_excel(xls, xls.sheet_names[0])
-                required = {"table_name", "column_name", "data_type", "is_nullable"}
-                missing = required - {c.lower() for c in df.columns}
-                if missing:
-                    raise ValueError(f"Excel missing required columns: {missing}")
-                # Normalize columns
-                df.columns = [c.lower() for c in df.columns]
-                for table_name, group in df.groupby('table_name'):
-                    columns = []
-                    for _, row in group.iterrows():
-                        columns.append({
-                            'column_name': str(row['column_name']),
-                            'data_type': str(row['data_type']),
-                            'is_nullable': 'YES' if str(row['is_nullable']).strip().upper() in ['YES', 'Y', 'TRUE', '1'] else 'NO',
-                        })
-                    schema['tables'][str(table_name)] = {
-                        'columns': columns,
-                        'column_names': [c['column_name'] for c in columns]
-                    }
-            else:
-                # Sheet per table
-                for sheet in xls.sheet_names:
-                    df = pd.read_excel(xls, sheet)
-                    lower_cols = [c.lower() for c in df.columns]
-                    mapping = {name: idx for idx, name in enumerate(lower_cols)}
-                    def get(col):
-                        return df.iloc[:, mapping[col]] if col in mapping else None
-                    col_name_series = get('column_name') or get('column') or get('name')
-                    data_type_series = get('data_type') or get('type')
-                    is_nullable_series = get('is_nullable') or get('nullable')
-                    if col_name_series is None or data_type_series is None:
-                        logger.warning(f"Sheet {sheet} missing required columns; skipping")
-                        continue
-                    columns = []
-                    for i in range(len(col_name_series)):
-                        is_nullable_val = 'YES'
-                        if is_nullable_series is not None:
-                            v = str(is_nullable_series.iloc[i]).strip().upper()
-                            is_nullable_val = 'YES' if v in ['YES', 'Y', 'TRUE', '1'] else 'NO'
-                        columns.append({
-                            'column_name': str(col_name_series.iloc[i]),
-                            'data_type': str(data_type_series.iloc[i]),
-                            'is_nullable': is_nullable_val,
-                        })
-                    schema['tables'][sheet] = {
-                        'columns': columns,
-                        'column_names': [c['column_name'] for c in columns]
-                    }
+            mtime_ns = path.stat().st_mtime_ns
+            cached = self.cache
+            if cached.get('tables') and cached.get('excel_path') == str(path) and cached.get('excel_mtime') == mtime_ns:
+                # The loaded schema (possibly from a previous process) came from this exact file
+                logger.info("Excel unchanged, using cached schema")
+                cached['timestamp'] = time.time()
+                self.save_cache()
+                return cached
+            schema = {
+                'timestamp': time.time(),
+                'tables': _read_schema_workbook(str(path), mtime_ns),
+                'excel_path': str(path),
+                'excel_mtime': mtime_ns,
+            }
             self.cache = schema
             self.save_cache()
-            logger.info(f"Loaded schema from Excel. Found {len(schema['tables'])} tables.")
+            logger.info("Loaded schema from Excel. Found %s tables.", len(schema['tables']))
             return schema
         except Exception as e:
-            logger.error(f"Failed to load schema from Excel: {str(e)}")
+            logger.error("Failed to load schema from Excel: %s", e)
             raise
     
     def get_schema(self, force_refresh: bool = False) -> Dict[str, Any]:
-        """Get schema (from cache or refresh)."""
-        if force_refresh or not self.is_cache_valid():
-            return self.refresh_schema()
-        return self.cache
+        """Get schema (from cache or refresh).
+
+        Only one refresh runs at a time; callers arriving meanwhile wait for it and
+        reuse its result instead of querying the database again. If a refresh fails
+        the loaded schema is kept: forced refreshes re-raise, other callers get the
+        stale schema (offline mode) and the database is not retried for SCHEMA_CHECK_INTERVAL.
+        """
+        if not force_refresh and (self.is_cache_valid() or self._serving_stale()):
+            return self.cache
+        in_flight = self._refresh_lock.locked()
+        with self._refresh_lock:
+            # Re-check: the refresh we waited on may have produced a fresh schema
+            if (in_flight or not force_refresh) and self.is_cache_valid():
+                return self.cache
+            try:
+                return self.refresh_schema()
+            except Exception:
+                self._refresh_retry_at = time.monotonic() + settings.SCHEMA_CHECK_INTERVAL
+                if force_refresh or not self.cache.get('tables'):
+                    raise
+                logger.warning("Schema refresh failed; using the cached schema")
+                return self.cache
+    
+    @property
+    def refreshing(self) -> bool:
+        """Whether a refresh is in flight; get_schema calls that need a new schema wait for it."""
+        return self._refresh_lock.locked()
+    
+    def _serving_stale(self) -> bool:
+        return bool(self.cache.get('tables')) and time.monotonic() < self._refresh_retry_at
     
     def get_table_info(self, table_name: str) -> Optional[Dict[str, Any]]:
         """Get information about a specific table."""
         schema = self.get_schema()
         return schema.get('tables', {}).get(table_name)
     
+    def resolve_table_name(self, name: str) -> Optional[str]:
+        """Return the cached table name matching `name` case-insensitively, allowing a trailing plural 's'."""
+        schema = self.get_schema()
+        if self._name_index_source is not schema:
+            # Rebuilt only when a new schema is loaded; keys are lowercased names plus singular forms
+            index: Dict[str, str] = {}
+            for table_name in schema.get('tables', {}):
+                key = table_name.lower()
+                index.setdefault(key, table_name)
+                if key.endswith('s'):
+                    index.setdefault(key[:-1], table_name)
+            self._name_index = index
+            self._name_index_source = schema
+        key = name.strip().lower()
+        canonical = self._name_index.get(key)
+        if canonical is None and key.endswith('s'):
+            canonical = self._name_index.get(key[:-1])
+        return canonical
+    
     def get_schema_as_text(self) -> str:
         """Get schema as formatted text for LLM."""
         schema = self.get_schema()
-        text_parts = []
-        
-        for table_name, table_info in schema.get('tables', {}).items():
-            text_parts.append(f"\nTable: {table_name}")
-            text_parts.append("Columns:")
-            for col in table_info['columns']:
-                nullable = "NULL" if col['is_nullable'] == 'YES' else "NOT NULL"
-                text_parts.append(
-                    f"  - {col['column_name']} ({col['data_type']}) {nullable}"
+        if self._text_source is not schema:
+            # Rebuilt only when a new schema object is loaded, like the table-name index
+            self._text = "\n".join(
+                line
+                for table_name, table_info in schema.get('tables', {}).items()
+                for line in (
+                    f"\nTable: {table_name}",
+                    *((f"Rows (approx.): {table_info['row_count']}",) if 'row_count' in table_info else ()),
+                    "Columns:",
+                    *(
+                        f"  - {column_name} ({data_type}) {'NULL' if is_nullable == 'YES' else 'NOT NULL'}"
+                        for column_name, data_type, is_nullable in zip(
+                            table_info['column_names'], table_info['data_types'], table_info['is_nullable']
+                        )
+                    ),
                 )
-        
-        return "\n".join(text_parts)
+            )
+            self._text_source = schema
+        return self._text
 
     def load_manual_schema(self) -> Dict[str, Any]:
         """Load a predefined manual schema for client, contacts, and project tables."""
         logger.info("Loading manual schema definition")
-        def build_columns(pairs: list[tuple[str, str]]) -> list[dict[str, str]]:
-            return [
-                {"column_name": name, "data_type": dtype, "is_nullable": "YES"}
-                for name, dtype in pairs
-            ]
-
         manual = {
             'timestamp': time.time(),
-            'tables': {
-                'client': {
-                    'columns': build_columns([
-                        ("id", "INT"),
-                        ("name", "NVARCHAR(255)"),
-                        ("slug", "NVARCHAR(255)"),
-                        ("email", "NVARCHAR(255)"),
-                        ("phone", "NVARCHAR(50)"),
-                        ("address1", "NVARCHAR(255)"),
-                        ("address2", "NVARCHAR(255)"),
-                        ("city", "NVARCHAR(100)"),
-                        ("state", "NVARCHAR(100)"),
-                        ("country", "NVARCHAR(100)"),
-                        ("zipcode", "NVARCHAR(20)"),
-                        ("created_at", "DATETIME2"),
-                        ("updated_at", "DATETIME2"),
-                        ("team_id", "INT"),
-                        ("channel_id", "INT"),
-                        ("drive_id", "NVARCHAR(255)"),
-                        ("delta_token", "NVARCHAR(255)"),
-                        ("drive_item_id", "NVARCHAR(255)"),
-                        ("hubspot_id", "NVARCHAR(255)"),
-                        ("owner_name", "NVARCHAR(255)"),
-                        ("status", "NVARCHAR(50)"),
-                        ("industry", "NVARCHAR(100)"),
-                        ("type", "NVARCHAR(50)"),
-                        ("no_employees", "INT"),
-                        ("description", "NVARCHAR(MAX)"),
-                        ("timezone", "NVARCHAR(100)"),
-                        ("created_by", "NVARCHAR(255)"),
-                        ("client_number", "NVARCHAR(100)")
-                    ]),
-                    'column_names': [
-                        "id","name","slug","email","phone","address1","address2","city","state","country","zipcode","created_at","updated_at","team_id","channel_id","drive_id","delta_token","drive_item_id","hubspot_id","owner_name","status","industry","type","no_employees","description","timezone","created_by","client_number"
-                    ]
-                },
-                'contacts': {
-                    'columns': build_columns([
-                        ("id", "INT"),
-                        ("first_name", "NVARCHAR(100)"),
-                        ("last_name", "NVARCHAR(100)"),
-                        ("email", "NVARCHAR(255)"),
-                        ("owner", "NVARCHAR(255)"),
-                        ("phone", "NVARCHAR(50)"),
-                        ("mobile", "NVARCHAR(50)"),
-                        ("stage", "NVARCHAR(50)"),
-                        ("client_id", "INT"),
-                        ("client_name", "NVARCHAR(255)"),
-                        ("hubspot_id", "NVARCHAR(255)"),
-                        ("created_at", "DATETIME2"),
-                        ("updated_at", "DATETIME2")
-                    ]),
-                    'column_names': [
-                        "id","first_name","last_name","email","owner","phone","mobile","stage","client_id","client_name","hubspot_id","created_at","updated_at"
-                    ]
-                },
-                'project': {
-                    'columns': build_columns([
-                        ("id", "INT"),
-                        ("name", "NVARCHAR(255)"),
-                        ("client_id", "INT"),
-                        ("description", "NVARCHAR(MAX)"),
-                        ("slug", "NVARCHAR(255)"),
-                        ("category", "NVARCHAR(100)"),
-                        ("status", "NVARCHAR(50)"),
-                        ("priority", "NVARCHAR(50)"),
-                        ("start_date", "DATE"),
-                        ("end_date", "DATE"),
-                        ("currency", "NVARCHAR(10)"),
-                        ("budget", "DECIMAL(18,2)"),
-                        ("created_by", "NVARCHAR(255)"),
-                        ("updated_by", "NVARCHAR(255)"),
-                        ("created_at", "DATETIME2"),
-                        ("updated_at", "DATETIME2"),
-                        ("billing_type", "NVARCHAR(50)"),
-                        ("amount_billed", "DECIMAL(18,2)"),
-                        ("budget_hours", "DECIMAL(18,2)"),
-                        ("team_id", "INT"),
-                        ("channel_id", "INT"),
-                        ("drive_id", "NVARCHAR(255)"),
-                        ("drive_subscription_id", "NVARCHAR(255)"),
-                        ("delta_token", "NVARCHAR(255)"),
-                        ("drive_item_id", "NVARCHAR(255)"),
-                        ("hubspot_id", "NVARCHAR(255)"),
-                        ("xero_id", "NVARCHAR(255)"),
-                        ("owner_id", "INT"),
-                        ("owner_email", "NVARCHAR(255)"),
-                        ("last_modified_date", "DATE"),
-                        ("project_number", "NVARCHAR(100)")
-                    ]),
-                    'column_names': [
-                        "id","name","client_id","description","slug","category","status","priority","start_date","end_date","currency","budget","created_by","updated_by","created_at","updated_at","billing_type","amount_billed","budget_hours","team_id","channel_id","drive_id","drive_subscription_id","delta_token","drive_item_id","hubspot_id","xero_id","owner_id","owner_email","last_modified_date","project_number"
-                    ]
-                }
-            }
+            'tables': _MANUAL_SCHEMA_TABLES,
         }
         self.cache = manual
         self.save_cache()
@@ -286,4 +545,18 @@ class SchemaCache:
         return manual
 
 # Global schema cache instance
-schema_cache = SchemaCache()
\ No newline at end of file
+schema_cache = SchemaCache()
+
+if __name__ == "__main__":
+    # Regenerate the checked-in offline seed: python -m database.schema_cache [--excel PATH]
+    import argparse
+    parser = argparse.ArgumentParser(description="Rebuild schema_cache.json from the database or an Excel workbook.")
+    parser.add_argument("--excel", type=Path, help="read the schema from this workbook instead of the database")
+    parser.add_argument("--output", type=Path, help="destination (default: the project's schema_cache.json)")
+    args = parser.parse_args()
+    if args.excel:
+        schema_cache.load_schema_from_excel(args.excel)
+    else:
+        schema_cache.get_schema(force_refresh=True)
+    schema_cache.export_json(args.output)
+    print(f"Wrote {len(schema_cache.cache.get('tables', {}))} tables to {args.output or schema_cache.cache_file}")
\ No newline at end of file
@@ -26,7 +26,13 @@ class GraphState(TypedDict):
     
     # Execution
     execution_approved: bool
+    # Independent statements the executor runs in parallel with generated_sql
+    pending_sql: List[str]
     query_results: Optional[List[Dict[str, Any]]]
+    query_results_preview: Optional[List[Dict[str, Any]]]
+    query_row_count: Optional[int]
+    query_rows_truncated: bool
+    pending_results: Optional[List[List[Dict[str, Any]]]]
     execution_error: Optional[str]
     
     # Formatting
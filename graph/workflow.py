@@ -1,7 +1,11 @@
 """LangGraph workflow definition."""
-from typing import Literal
+import asyncio
+import functools
+from typing import List, Literal
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from graph.state import GraphState
+from agents._gemini_http import gemini_client
 from agents.nlu_agent import nlu_agent
 from agents.schema_agent import schema_agent
 from agents.text2sql_agent import text2sql_agent
@@ -12,19 +16,20 @@ from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+@functools.lru_cache(maxsize=1)
 def create_workflow() -> StateGraph:
-    """Create the Text-to-SQL LangGraph workflow."""
+    """Create the Text-to-SQL LangGraph workflow (compiled once per process)."""
     
     # Initialize workflow
     workflow = StateGraph(GraphState)
     
-    # Add nodes
-    workflow.add_node("nlu", nlu_agent.analyze_intent)
-    workflow.add_node("schema", schema_agent.get_relevant_schema)
-    workflow.add_node("text2sql", text2sql_agent.generate_sql)
+    # Add nodes; LLM-backed nodes carry an async variant used by ainvoke()
+    workflow.add_node("nlu", RunnableLambda(nlu_agent.analyze_intent, afunc=nlu_agent.analyze_intent_async))
+    workflow.add_node("schema", RunnableLambda(schema_agent.get_relevant_schema, afunc=schema_agent.get_relevant_schema_async))
+    workflow.add_node("text2sql", RunnableLambda(text2sql_agent.generate_sql, afunc=text2sql_agent.generate_sql_async))
     workflow.add_node("validator", validator_agent.validate_sql)
-    workflow.add_node("executor", executor_agent.execute_sql)
-    workflow.add_node("formatter", formatter_agent.format_results)
+    workflow.add_node("executor", RunnableLambda(executor_agent.execute_sql, afunc=executor_agent.execute_sql_async))
+    workflow.add_node("formatter", RunnableLambda(formatter_agent.format_results, afunc=formatter_agent.format_results_async))
     
     # Define edges
     workflow.add_edge("nlu", "schema")
@@ -33,12 +38,10 @@ def create_workflow() -> StateGraph:
     
     # Conditional edge from validator
     def should_execute(state: GraphState) -> Literal["executor", "end"]:
-        if state.get("is_valid", False) and state.get("execution_approved", False):
-            return "executor"
-        elif not state.get("is_valid", False):
-            return "end"
-        else:
-            # Awaiting approval
+        # Invalid SQL and SQL awaiting approval both stop here; so does a partial state missing either key
+        try:
+            return "executor" if state["is_valid"] and state["execution_approved"] else "end"
+        except KeyError:
             return "end"
     
     workflow.add_conditional_edges(
@@ -52,9 +55,10 @@ def create_workflow() -> StateGraph:
     
     # Conditional edge from executor
     def should_format(state: GraphState) -> Literal["formatter", "end"]:
-        if state.get("query_results") is not None:
-            return "formatter"
-        return "end"
+        try:
+            return "end" if state["query_results"] is None else "formatter"
+        except KeyError:
+            return "end"
     
     workflow.add_conditional_edges(
         "executor",
@@ -73,4 +77,22 @@ def create_workflow() -> StateGraph:
     return workflow.compile()
 
 # Create compiled workflow
-text2sql_workflow = create_workflow()
\ No newline at end of file
+text2sql_workflow = create_workflow()
+
+def run_workflow_batch(states: List[GraphState]) -> List[GraphState]:
+    """Run several independent queries concurrently.
+
+    Each query still runs its nodes in order, but the Gemini calls of different
+    queries overlap, so the batch takes roughly as long as its slowest query.
+    """
+    async def _run_all():
+        try:
+            return await asyncio.gather(*(text2sql_workflow.ainvoke(state) for state in states))
+        finally:
+            await gemini_client.aclose()
+    
+    return list(asyncio.run(_run_all()))
+
+def run_workflow(state: GraphState) -> GraphState:
+    """Run one query through the graph's async node variants, on a private event loop."""
+    return run_workflow_batch([state])[0]
\ No newline at end of file
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules import the settings singleton, which reads these at import time
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("DB_POOL_MIN_SIZE", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
\ No newline at end of file
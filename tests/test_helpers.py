@@ -0,0 +1,116 @@
+import pytest
+
+from agents._prompt_cache import normalize_query
+from utils.helpers import ensure_top_limit, extract_tables_from_query, is_safe_query, row_count_query
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT * FROM client", "SELECT TOP 100 * FROM client"),
+        ("  select name FROM client", "  select TOP 100 name FROM client"),
+        ("SELECT DISTINCT city FROM client", "SELECT DISTINCT TOP 100 city FROM client"),
+        ("SELECT ALL city FROM client", "SELECT ALL TOP 100 city FROM client"),
+    ],
+)
+def test_ensure_top_limit_inserts_top(sql, expected):
+    assert ensure_top_limit(sql) == expected
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT TOP 5 * FROM client",
+        "SELECT TOP (5) * FROM client",
+        "SELECT DISTINCT TOP 5 city FROM client",
+        "SELECT * FROM client ORDER BY id OFFSET 10 ROWS FETCH NEXT 5 ROWS ONLY",
+        "SELECT * FROM client ORDER BY id OFFSET 10 ROWS;",
+    ],
+)
+def test_ensure_top_limit_keeps_existing_limit(sql):
+    assert ensure_top_limit(sql) == sql
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT * FROM client WHERE note = 'top'", "SELECT TOP 100 * FROM client WHERE note = 'top'"),
+        (
+            "SELECT * FROM client WHERE note = 'skip OFFSET 1 ROWS'",
+            "SELECT TOP 100 * FROM client WHERE note = 'skip OFFSET 1 ROWS'",
+        ),
+        ("SELECT top, offset, fetch FROM client", "SELECT TOP 100 top, offset, fetch FROM client"),
+        ("SELECT c.name AS top FROM client c", "SELECT TOP 100 c.name AS top FROM client c"),
+    ],
+)
+def test_ensure_top_limit_ignores_keywords_in_literals_and_names(sql, expected):
+    assert ensure_top_limit(sql) == expected
+
+
+def test_ensure_top_limit_leaves_non_select_alone():
+    sql = "WITH c AS (SELECT 1 AS x) SELECT * FROM c"
+    assert ensure_top_limit(sql) == sql
+
+
+def test_row_count_query_skips_small_top():
+    assert row_count_query("SELECT TOP 100 * FROM client", 1000) is None
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT TOP 5000 * FROM client",
+        "SELECT TOP 50 PERCENT * FROM client",
+        "SELECT * FROM client ORDER BY id OFFSET 0 ROWS FETCH NEXT 5000 ROWS ONLY;",
+    ],
+)
+def test_row_count_query_wraps_unbounded_select(sql):
+    body = sql.rstrip(";")
+    assert row_count_query(sql, 1000) == f"SELECT COUNT_BIG(*) AS row_count FROM ({body}) AS counted"
+
+
+def test_row_count_query_skips_cte():
+    assert row_count_query("WITH c AS (SELECT 1 AS x) SELECT * FROM c", 1000) is None
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT * FROM dbo.[Client] c JOIN project p ON p.client_id = c.id", ("dbo.Client", "project")),
+        ("SELECT * FROM client, contacts", ("client", "contacts")),
+        ("SELECT * FROM (SELECT id FROM project) AS p", ("project",)),
+        ("SELECT * FROM client WHERE id IN (SELECT client_id FROM project)", ("client", "project")),
+        ("SELECT EXTRACT(YEAR FROM created_at) AS y FROM client", ("client",)),
+        ("SELECT TRIM(' ' FROM name) FROM contacts", ("contacts",)),
+        ("SELECT TRIM(')' FROM name) FROM contacts", ("contacts",)),
+        ("SELECT * FROM client WHERE note = 'moved from Paris'", ("client",)),
+    ],
+)
+def test_extract_tables_from_query(sql, expected):
+    assert extract_tables_from_query(sql) == expected
+
+
+@pytest.mark.parametrize(
+    "sql, safe",
+    [
+        ("SELECT * FROM client", True),
+        ("SELECT * FROM client; DROP TABLE client", False),
+        ("DELETE FROM client", False),
+        ("SELECT * FROM client WHERE id IN (EXEC sp_executesql 'x')", False),
+    ],
+)
+def test_is_safe_query(sql, safe):
+    assert is_safe_query(sql)[0] is safe
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        ("Show all clients?", "show all clients"),
+        ("  show   ALL clients  ", "show all clients"),
+        ("Clients, in Paris.", "clients in paris"),
+        ("revenue of 3.5 million", "revenue of 3.5 million"),
+    ],
+)
+def test_normalize_query(question, expected):
+    assert normalize_query(question) == expected
\ No newline at end of file
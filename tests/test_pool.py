@@ -0,0 +1,95 @@
+import pymssql
+import pytest
+
+from database.pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        if not self.conn.alive:
+            raise pymssql.OperationalError("connection is dead")
+
+    def fetchall(self):
+        return [{"ping": 1}]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def pool(opened):
+    def factory():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(factory, size=2)
+
+
+def test_connection_is_reused(pool, opened):
+    with pool.acquire() as first:
+        pass
+    with pool.acquire() as second:
+        pass
+    assert first is second
+    assert len(opened) == 1
+
+
+def test_statement_error_keeps_healthy_connection(pool, opened):
+    with pytest.raises(pymssql.OperationalError):
+        with pool.acquire():
+            raise pymssql.OperationalError("Invalid column name 'foo'.")
+    with pool.acquire() as conn:
+        pass
+    assert conn is opened[0]
+    assert not conn.closed
+
+
+def test_broken_connection_is_discarded(pool, opened):
+    with pytest.raises(pymssql.OperationalError):
+        with pool.acquire() as conn:
+            conn.alive = False
+            raise pymssql.OperationalError("DB-Lib error message 20047")
+    assert opened[0].closed
+    with pool.acquire() as conn:
+        pass
+    assert conn is opened[1]
+
+
+def test_other_errors_return_connection(pool, opened):
+    with pytest.raises(ValueError):
+        with pool.acquire():
+            raise ValueError("not a database error")
+    with pool.acquire() as conn:
+        pass
+    assert conn is opened[0]
+
+
+def test_stale_idle_connection_is_replaced(pool, opened, monkeypatch):
+    with pool.acquire() as conn:
+        conn.alive = False
+    monkeypatch.setattr("database.pool.IDLE_CHECK_SECONDS", -1)
+    with pool.acquire() as fresh:
+        pass
+    assert fresh is opened[1]
+    assert opened[0].closed
\ No newline at end of file
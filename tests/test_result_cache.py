@@ -0,0 +1,54 @@
+from database.connection import QueryResultCache, canonical_sql, referenced_tables
+from database.schema_cache import _changed_tables
+
+
+def test_canonical_sql_ignores_case_whitespace_and_comments():
+    assert canonical_sql("SELECT  *\nFROM Client -- all\n;") == canonical_sql("select * from client")
+
+
+def test_canonical_sql_keeps_literals_verbatim():
+    assert canonical_sql("SELECT * FROM t WHERE n = 'Acme'") != canonical_sql("SELECT * FROM t WHERE n = 'ACME'")
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("database.connection.time.monotonic", lambda: now[0])
+    cache = QueryResultCache(ttl=10)
+    key = QueryResultCache.make_key("SELECT 1", None)
+    cache.set(key, [{"a": 1}])
+    assert cache.get(key) == [{"a": 1}]
+    now[0] = 111.0
+    assert cache.get(key) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryResultCache(ttl=60, max_entries=2)
+    cache.set("a", [])
+    cache.set("b", [])
+    cache.get("a")
+    cache.set("c", [])
+    assert cache.get("b") is None
+    assert cache.get("a") == []
+
+
+def test_invalidate_tables_drops_only_dependent_entries():
+    cache = QueryResultCache(ttl=60)
+    cache.set("clients", [{"n": 1}], referenced_tables("SELECT COUNT(*) FROM dbo.[Client]"))
+    cache.set("joined", [], referenced_tables("SELECT * FROM project p JOIN contacts c ON c.id = p.contact_id"))
+    assert cache.invalidate_tables({"contacts"}) == 1
+    assert cache.get("joined") is None
+    assert cache.get("clients") == [{"n": 1}]
+
+
+def test_changed_tables_reports_altered_resized_and_dropped_tables():
+    old = {
+        "Client": {"column_names": ["id"], "data_types": ["int"], "row_count": 5},
+        "Project": {"column_names": ["id"], "data_types": ["int"], "row_count": 1},
+        "Contacts": {"column_names": ["id"], "data_types": ["int"]},
+    }
+    new = {
+        "Client": {"column_names": ["id"], "data_types": ["int"], "row_count": 6},
+        "Project": {"column_names": ["id"], "data_types": ["int"], "row_count": 1},
+    }
+    assert _changed_tables(old, new) == {"client", "contacts", "columns", "tables"}
+    assert _changed_tables(new, new) == set()
\ No newline at end of file
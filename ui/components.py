@@ -1,7 +1,20 @@
 """Reusable Streamlit UI components."""
 import streamlit as st
 import pandas as pd
-from typing import List, Dict, Any
+from database.result_set import ResultSet
+from utils.helpers import sanitize_sql
+from typing import List, Dict, Any, Union
+
+_WORKFLOW_STEPS = (
+    ("NLU Analysis", "nlu_complete"),
+    ("Schema Retrieval", "schema_retrieved"),
+    ("SQL Generation", "sql_generated"),
+    ("Validation", "validated"),
+    ("Execution", "executed"),
+    ("Formatting", "complete"),
+)
+# step key -> position, so a render needs no list scans
+_STEP_INDEX = {key: idx for idx, (_, key) in enumerate(_WORKFLOW_STEPS)}
 
 def display_schema_info(schema: Dict[str, Any]):
     """Display database schema information."""
@@ -11,33 +24,41 @@ def display_schema_info(schema: Dict[str, Any]):
     
     for table_name, table_info in tables.items():
         with st.expander(f"Table: {table_name}", expanded=False):
-            columns_data = []
-            for col in table_info['columns']:
-                columns_data.append({
-                    'Column': col['column_name'],
-                    'Type': col['data_type'],
-                    'Nullable': col['is_nullable']
-                })
-            df = pd.DataFrame(columns_data)
+            df = pd.DataFrame({
+                'Column': table_info['column_names'],
+                'Type': table_info['data_types'],
+                'Nullable': table_info['is_nullable'],
+            })
             st.dataframe(df, use_container_width=True)
 
 def display_sql_query(sql: str, title: str = "Generated SQL"):
     """Display SQL query in a formatted code block."""
     st.subheader(f"⚡ {title}")
-    st.code(sql, language="sql")
+    st.code(sanitize_sql(sql), language="sql")
 
-def display_results_table(results: List[Dict[str, Any]]):
-    """Display query results in a table."""
+def display_results_table(results: Union[List[Dict[str, Any]], Dict[str, List[Any]], ResultSet]):
+    """Display query results (row dicts, column -> values, or a ResultSet) in a table."""
     if not results:
         st.info("No results found.")
         return
     
-    df = pd.DataFrame(results)
-    st.subheader(f"📊 Results ({len(results)} rows)")
+    if isinstance(results, ResultSet):
+        df = pd.DataFrame(results.data, columns=results.columns, copy=False)
+    elif isinstance(results, dict):
+        df = pd.DataFrame(results, copy=False)
+    else:
+        # Every row has the same keys, so take the columns from the first one instead of letting pandas infer them
+        df = pd.DataFrame.from_records(results, columns=list(results[0].keys()))
+    st.subheader(f"📊 Results ({len(df)} rows)")
     st.dataframe(df, use_container_width=True)
     
-    # Download button
-    csv = df.to_csv(index=False)
+    # Download button; the CSV is rendered once per result object, not on every rerun
+    cached = st.session_state.get('_results_csv')
+    if cached is not None and cached[0] is results:
+        csv = cached[1]
+    else:
+        csv = df.to_csv(index=False)
+        st.session_state['_results_csv'] = (results, csv)
     st.download_button(
         label="⬇️ Download as CSV",
         data=csv,
@@ -49,25 +70,15 @@ def display_workflow_status(state: Dict[str, Any]):
     """Display workflow execution status."""
     st.subheader("🔄 Workflow Status")
     
-    steps = [
-        ("NLU Analysis", "nlu_complete"),
-        ("Schema Retrieval", "schema_retrieved"),
-        ("SQL Generation", "sql_generated"),
-        ("Validation", "validated"),
-        ("Execution", "executed"),
-        ("Formatting", "complete")
-    ]
-    
     current_step = state.get("step", "")
+    current_idx = _STEP_INDEX.get(current_step, 0)
     
-    cols = st.columns(len(steps))
-    for idx, (step_name, step_key) in enumerate(steps):
+    cols = st.columns(len(_WORKFLOW_STEPS))
+    for idx, (step_name, step_key) in enumerate(_WORKFLOW_STEPS):
         with cols[idx]:
             if step_key == current_step:
                 st.markdown(f"**🔵 {step_name}**")
-            elif steps.index((step_name, step_key)) < steps.index(
-                next((s for s in steps if s[1] == current_step), steps[0])
-            ):
+            elif idx < current_idx:
                 st.markdown(f"✅ {step_name}")
             else:
                 st.markdown(f"⚪ {step_name}")
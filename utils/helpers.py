@@ -1,91 +1,131 @@
 """Helper utility functions."""
+import functools
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import sqlparse
 
+_LINE_COMMENT_RE = re.compile(r'--.*$', re.MULTILINE)
+_BLOCK_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_LEADING_SELECT_RE = re.compile(r'^(\s*SELECT\b(?:\s+(?:DISTINCT|ALL)\b)?)', re.IGNORECASE)
+# A row limit the query already has: TOP on the leading SELECT, or a trailing OFFSET ... ROWS [FETCH ... ONLY]
+_LEADING_TOP_RE = re.compile(r'^\s*SELECT\s+(?:(?:DISTINCT|ALL)\s+)?TOP\s*[(\d@]', re.IGNORECASE)
+_TRAILING_OFFSET_RE = re.compile(r'\bOFFSET\b[^;]*?\bROWS?\b(?:\s+FETCH\b[^;]*?\bONLY)?\s*;?\s*$', re.IGNORECASE)
+# String literals are blanked out before looking for keywords, so WHERE note = 'top' is not a limit
+_STRING_LITERAL_RE = re.compile(r"N?'(?:[^']|'')*'")
+# Leading "TOP n" / "TOP (n)", not TOP ... PERCENT
+_LEADING_TOP_N_RE = re.compile(
+    r'^\s*SELECT\s+(?:(?:DISTINCT|ALL)\s+)?TOP\s*(?:\(\s*(\d+)\s*\)|(\d+)\b)(?!\s*PERCENT\b)', re.IGNORECASE
+)
+# Table references after FROM/JOIN: possibly qualified, bracketed or quoted names with an optional
+# alias, comma-separated; derived tables "(SELECT ...)" do not match
+_NAME = r'(?:\[[^\]]+\]|"[^"]+"|[\w#]+)(?:\s*\.\s*(?:\[[^\]]+\]|"[^"]+"|[\w#]+))*'
+_ALIAS = (
+    r'(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|OUTER|ON|GROUP|ORDER|HAVING'
+    r'|UNION|EXCEPT|INTERSECT|WITH|OPTION)\b)\w+)?'
+)
+_FROM_LIST_RE = re.compile(rf'\b(?:FROM|JOIN)\s+({_NAME}{_ALIAS}(?:\s*,\s*{_NAME}{_ALIAS})*)', re.IGNORECASE)
+_TABLE_REF_RE = re.compile(rf'({_NAME}){_ALIAS}', re.IGNORECASE)
+_NAME_PART_RE = re.compile(r'\[[^\]]+\]|"[^"]+"|[\w#]+')
+_PAREN_RE = re.compile(r'[()]')
+# A parenthesis that opens a subquery; any other one around FROM is a call like EXTRACT(YEAR FROM d)
+_SUBQUERY_START_RE = re.compile(r'\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_DANGEROUS_KEYWORD_RE = re.compile(
+    r"""\b(
+        DROP | DELETE | TRUNCATE | ALTER |
+        CREATE | INSERT | UPDATE | MERGE | EXECUTE | EXEC |
+        GRANT | REVOKE |
+        XP_\w+ | SP_EXECUTESQL    # extended procedures, dynamic SQL
+    )\b""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+@functools.lru_cache(maxsize=2048)
+def sanitize_sql_for_exec(sql: str) -> str:
+    """Strip comments from SQL that is about to be validated and executed; no reformatting."""
+    sql = _LINE_COMMENT_RE.sub('', sql)
+    sql = _BLOCK_COMMENT_RE.sub('', sql)
+    return sql.strip()
+
+@functools.lru_cache(maxsize=2048)
 def sanitize_sql(sql: str) -> str:
-    """Sanitize and format SQL query."""
-    # Remove comments
-    sql = re.sub(r'--.*$', '', sql, flags=re.MULTILINE)
-    sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.DOTALL)
-    
+    """Sanitize and format SQL query for display."""
     # Format SQL
     formatted = sqlparse.format(
-        sql,
+        sanitize_sql_for_exec(sql),
         reindent=True,
         keyword_case='upper'
     )
     
     return formatted.strip()
 
+@functools.lru_cache(maxsize=2048)
 def is_safe_query(sql: str) -> tuple[bool, str]:
     """Check if SQL query is safe (no destructive operations)."""
-    sql_upper = sql.upper()
-    
-    # List of dangerous keywords
-    dangerous_keywords = [
-        'DROP', 'DELETE', 'TRUNCATE', 'ALTER', 
-        'CREATE', 'INSERT', 'UPDATE', 'EXEC',
-        'EXECUTE', 'GRANT', 'REVOKE'
-    ]
-    
-    for keyword in dangerous_keywords:
-        if re.search(r'\b' + keyword + r'\b', sql_upper):
-            return False, f"Query contains dangerous keyword: {keyword}"
+    match = _DANGEROUS_KEYWORD_RE.search(sql)
+    if match:
+        return False, f"Query contains dangerous keyword: {match.group(1).upper()}"
     
     # Check for multiple statements
     if ';' in sql.strip().rstrip(';'):
         return False, "Multiple SQL statements not allowed"
     
     # Must be a SELECT statement
-    if not sql_upper.strip().startswith('SELECT'):
+    if sql.lstrip()[:6].upper() != 'SELECT':
         return False, "Only SELECT queries are allowed"
     
     return True, "Query is safe"
 
-def extract_tables_from_query(sql: str) -> List[str]:
+@functools.lru_cache(maxsize=2048)
+def extract_tables_from_query(sql: str) -> Tuple[str, ...]:
     """Extract table names from SQL query."""
-    # Parse SQL
-    parsed = sqlparse.parse(sql)[0]
+    # Blank literals first, so TRIM(')' FROM name) neither unbalances parentheses nor matches FROM
+    sql = _STRING_LITERAL_RE.sub("''", sql)
     tables = []
-    
-    from_seen = False
-    for token in parsed.tokens:
-        if from_seen:
-            if isinstance(token, sqlparse.sql.IdentifierList):
-                for identifier in token.get_identifiers():
-                    tables.append(str(identifier.get_name()))
-            elif isinstance(token, sqlparse.sql.Identifier):
-                tables.append(str(token.get_name()))
-            elif token.ttype is None:
-                tables.append(str(token).strip())
-        
-        if token.ttype is sqlparse.tokens.Keyword and token.value.upper() == 'FROM':
-            from_seen = True
-    
-    return [t.strip('[]') for t in tables if t.strip()]
+    # End offsets of the parentheses still open at the current match
+    open_parens: List[int] = []
+    scanned = 0
+    for match in _FROM_LIST_RE.finditer(sql):
+        for paren in _PAREN_RE.finditer(sql, scanned, match.start()):
+            if paren.group() == '(':
+                open_parens.append(paren.end())
+            elif open_parens:
+                open_parens.pop()
+        scanned = match.start()
+        if open_parens and not _SUBQUERY_START_RE.match(sql, open_parens[-1]):
+            continue
+        for ref in _TABLE_REF_RE.finditer(match.group(1)):
+            name = ".".join(part.strip('[]"') for part in _NAME_PART_RE.findall(ref.group(1)))
+            if name not in tables:
+                tables.append(name)
+    # A tuple, since the cached result is shared between callers
+    return tuple(tables)
 
+@functools.lru_cache(maxsize=2048)
 def ensure_top_limit(sql: str, limit: int = 100) -> str:
     """Ensure a TOP limit exists for SELECT queries in MSSQL.
 
-    Inserts "TOP {limit}" immediately after the first SELECT if not already present
-    and if the query is not using OFFSET/FETCH. Uses lightweight string handling
-    to avoid driver-specific parse quirks.
+    Inserts "TOP {limit}" after the leading SELECT (and DISTINCT/ALL, where
+    T-SQL requires it) unless that SELECT already has a TOP or the query ends
+    in an OFFSET/FETCH clause.
     """
     if not sql:
         return sql
-    original = sql.strip()
-    upper = original.upper()
-    if not upper.startswith('SELECT'):
-        return sql
-    if ' TOP ' in upper or ' OFFSET ' in upper or ' FETCH ' in upper:
+    code = _STRING_LITERAL_RE.sub("''", sql)
+    if _LEADING_TOP_RE.match(code) or _TRAILING_OFFSET_RE.search(code):
         return sql
-    # Find the first occurrence of SELECT at the start and insert TOP
-    # Keep existing capitalization of SELECT by replacing only once at start
-    # Normalize leading whitespace
-    leading_ws_len = len(sql) - len(sql.lstrip())
-    leading_ws = sql[:leading_ws_len]
-    rest = sql[leading_ws_len:]
-    if rest[:6].upper() == 'SELECT':
-        return f"{leading_ws}{rest[:6]} TOP {limit}{rest[6:]}"
-    return sql
\ No newline at end of file
+    return _LEADING_SELECT_RE.sub(rf"\g<1> TOP {limit}", sql, count=1)
+
+@functools.lru_cache(maxsize=2048)
+def row_count_query(sql: str, max_rows: int) -> Optional[str]:
+    """COUNT_BIG(*) over a SELECT that may return more than max_rows rows, or None if it cannot.
+
+    A leading TOP n with n <= max_rows needs no count. The query is wrapped as a
+    derived table, so a CTE or unnamed/duplicate output columns make the count fail.
+    """
+    match = _LEADING_TOP_N_RE.match(sql)
+    if match and int(match.group(1) or match.group(2)) <= max_rows:
+        return None
+    body = sql.strip().rstrip(';').strip()
+    if not _LEADING_SELECT_RE.match(body):
+        return None
+    return f"SELECT COUNT_BIG(*) AS row_count FROM ({body}) AS counted"
\ No newline at end of file
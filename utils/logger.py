@@ -1,25 +1,27 @@
 """Logging configuration for the application."""
+import functools
 import logging
 import sys
 from config.settings import settings
 
-def setup_logger(name: str) -> logging.Logger:
-    """Setup and return a configured logger."""
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, settings.LOG_LEVEL))
-    
-    # Create console handler
+@functools.cache
+def _console_handler() -> logging.Handler:
+    # One stdout handler and formatter shared by every application logger
     handler = logging.StreamHandler(sys.stdout)
     handler.setLevel(getattr(logging, settings.LOG_LEVEL))
-    
-    # Create formatter
-    formatter = logging.Formatter(
+    handler.setFormatter(logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    handler.setFormatter(formatter)
-    
-    # Add handler to logger
-    if not logger.handlers:
-        logger.addHandler(handler)
+    ))
+    return handler
+
+def setup_logger(name: str) -> logging.Logger:
+    """Setup and return a configured logger."""
+    logger = logging.getLogger(name)
+    # Already configured by an earlier call (module re-import, Streamlit rerun).
+    if logger.handlers:
+        return logger
+    handler = _console_handler()
+    logger.setLevel(handler.level)
+    logger.addHandler(handler)
     
     return logger
\ No newline at end of file